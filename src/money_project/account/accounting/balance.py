@@ -1,98 +1,298 @@
-from datetime import date
+from datetime import date, timedelta
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 
-from ..models import ManualAccountStateModel, MoneyAccountModel
-from ..models.transaction import BaseTransactionManager
+from ..models import (
+    BalanceCheckpoint,
+    ManualAccountStateModel,
+    MoneyAccountModel,
+    TransactionOccurrence,
+)
+from .cache import cached_accounting
+from .context import AccountingContext, get_transactions
+from .money import cents_to_float, from_cents, to_cents
 
 
-def get_ideal_account_balance(
-    accounts: list[MoneyAccountModel], start_date: date, end_date: date
+def _day_numbers(dates) -> np.ndarray:
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def _balance_keys(account_ids: np.ndarray, days: np.ndarray) -> np.ndarray:
+    return (account_ids << 32) + days
+
+
+def _get_ideal_balance_cents(
+    accounts: list[MoneyAccountModel],
+    start_date: date,
+    end_date: date,
+    context: Optional[AccountingContext],
+    from_checkpoint: bool,
 ) -> pd.DataFrame:
-    df = BaseTransactionManager.build_dataframe_all(accounts, start_date, end_date)
-
-    try:
-        result = (
-            df.groupby(["date", "account_id"])
-            .agg(
-                amount=("amount", "sum"),
-            )
-            .reset_index()
-        )
-    except KeyError:
-        return df
-
-    # Reindex and add missing dates in range
-    back_fill_df = pd.date_range(start_date, end_date, freq="D")
-    result = (
-        result.set_index(["account_id", "date"])
-        .reindex(
-            pd.MultiIndex.from_product(
-                [[a.id for a in accounts], back_fill_df], names=["account_id", "date"]
-            ),
-        )
-        .reset_index()
+    """
+    Daily amount and balance of accounts in cents, one row per account and
+    day sorted by both.
+    """
+    accounts = list(accounts)
+    df = get_transactions(accounts, start_date, end_date, context)
+
+    account_ids = np.unique([a.id for a in accounts]).astype(np.int64)
+    days = np.arange(
+        np.datetime64(start_date, "D"),
+        np.datetime64(end_date, "D") + 1,
+        dtype="datetime64[D]",
+    )
+
+    # Sum amounts into an accounts x days grid, rows of transfers from other
+    # accounts are already mirrored onto the given accounts
+    amounts = np.zeros((len(account_ids), len(days)), dtype=np.int64)
+    rows = np.isin(df.account_id.to_numpy(np.int64), account_ids)
+    np.add.at(
+        amounts,
+        (
+            np.searchsorted(account_ids, df.account_id.to_numpy(np.int64)[rows]),
+            (
+                np.asarray(df.date.to_numpy()[rows], dtype="datetime64[D]") - days[0]
+            ).astype(np.int64),
+        ),
+        df.amount_cents.to_numpy(np.int64)[rows],
     )
-    result.amount.fillna(0, inplace=True)
-    result.date = result.date.apply(lambda x: x.date())
+    balances = np.cumsum(amounts, axis=1)
 
-    # Compute balance
-    result.sort_values(by=["account_id", "date"], ascending=True, inplace=True)
-    result["f_amount"] = result.amount.astype("float64")
-    result["balance"] = result.groupby("account_id").f_amount.cumsum()
+    if from_checkpoint:
+        opening = BalanceCheckpoint.objects.opening_balances(accounts, start_date)
+        balances += to_cents(opening[i] for i in account_ids)[:, np.newaxis]
 
-    result = result[["account_id", "date", "amount", "balance"]].set_index(
-        ["account_id", "date"]
+    return pd.DataFrame(
+        {
+            "amount_cents": amounts.ravel(),
+            "balance_cents": balances.ravel(),
+        },
+        index=pd.MultiIndex.from_arrays(
+            [
+                np.repeat(account_ids, len(days)),
+                np.tile(days.astype(object), len(account_ids)),
+            ],
+            names=["account_id", "date"],
+        ),
+    )
+
+
+@cached_accounting
+def get_ideal_account_balance(
+    accounts: list[MoneyAccountModel],
+    start_date: date,
+    end_date: date,
+    context: Optional[AccountingContext] = None,
+    from_checkpoint: bool = False,
+) -> pd.DataFrame:
+    """
+    Daily balance of accounts within the range.
+
+    By default the balance starts at zero on ``start_date``, with
+    ``from_checkpoint`` it starts at the stored balance of that day so the
+    whole history is taken into account.
+    """
+    result = _get_ideal_balance_cents(
+        accounts, start_date, end_date, context, from_checkpoint
+    )
+    return pd.DataFrame(
+        {
+            "amount": from_cents(result.amount_cents),
+            "balance": cents_to_float(result.balance_cents),
+        },
+        index=result.index,
     )
-    return result
 
 
+@cached_accounting
 def get_real_account_balance(
-    accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    accounts: list[MoneyAccountModel],
+    start_date: date,
+    end_date: date,
+    context: Optional[AccountingContext] = None,
+    from_checkpoint: bool = False,
 ) -> pd.DataFrame:
-    ideal_df = get_ideal_account_balance(accounts, start_date, end_date)
+    ideal_df = _get_ideal_balance_cents(
+        accounts, start_date, end_date, context, from_checkpoint
+    )
+    result = pd.DataFrame(
+        {
+            "amount": from_cents(ideal_df.amount_cents),
+            "balance": cents_to_float(ideal_df.balance_cents),
+        },
+        index=ideal_df.index,
+    )
     if ideal_df.empty:
-        return ideal_df
+        return result
 
-    # TODO do we need to filter by start date?
-    manual_states = [
-        {
-            "date": state.date,
-            "balance_snapshot": state.amount,
-            "account_id": state.account.id,
-        }
-        for state in ManualAccountStateModel.objects.filter(
+    states = pd.DataFrame(
+        ManualAccountStateModel.objects.filter(
             account__in=accounts, date__lte=end_date
-        )
-    ]
-    if not manual_states:
-        ideal_df["real_balance"] = ideal_df["balance"]
-        ideal_df["balance_snapshot"] = pd.NA
-        return ideal_df
-
-    manual_states_df = pd.DataFrame(manual_states).set_index(["account_id", "date"])
-
-    df = pd.concat([ideal_df, manual_states_df], axis=1, join="outer")
-    df.balance = df.groupby(["account_id"]).balance.fillna(method="ffill")
-    df.amount.fillna(0, inplace=True)
-    df["balance_snapshot_ffill"] = df["balance_snapshot"].astype("float64")
-    df.balance_snapshot_ffill = (
-        df.groupby(["account_id"])
-        .balance_snapshot_ffill.fillna(method="ffill")
-        .fillna(0)
+        ).values_list("account_id", "date", "amount"),
+        columns=["account_id", "date", "amount"],
     )
+    if states.empty:
+        result["real_balance"] = result["balance"]
+        result["balance_snapshot"] = pd.NA
+        return result
+
+    # Rows are sorted by account and day, encode both into one sortable key
+    account_ids = ideal_df.index.get_level_values("account_id").to_numpy(np.int64)
+    days = _day_numbers(ideal_df.index.get_level_values("date"))
+    keys = _balance_keys(account_ids, days)
+    balance = ideal_df.balance_cents.to_numpy(np.int64)
+
+    states = states.sort_values(["account_id", "date"], kind="stable")
+    states = states.drop_duplicates(["account_id", "date"], keep="last")
+    state_keys = _balance_keys(
+        states.account_id.to_numpy(np.int64), _day_numbers(states.date)
+    )
+    state_amounts = to_cents(states.amount)
+
+    # Ideal balance at the end of the snapshot day
+    positions = np.searchsorted(keys, state_keys)
+    in_window = positions < len(keys)
+    in_window[in_window] = keys[positions[in_window]] == state_keys[in_window]
+    state_balances = np.zeros(len(states), dtype=np.int64)
+    state_balances[in_window] = balance[positions[in_window]]
 
-    df["real_balance"] = (
-        df.balance
-        - (
-            df.where(~df.balance_snapshot.isna())
-            .groupby(["account_id"])
-            .balance.ffill()
-            .fillna(0)
+    # Only the last state before the window affects balances within it, its
+    # balance is the opening balance less occurrences after the state
+    before = states[~in_window].groupby("account_id").tail(1)
+    if not before.empty:
+        first_rows = np.searchsorted(
+            keys, _balance_keys(before.account_id.to_numpy(np.int64), days.min())
         )
-        + df.balance_snapshot_ffill
+        opening = (
+            balance[first_rows] - ideal_df.amount_cents.to_numpy(np.int64)[first_rows]
+        )
+
+        BalanceCheckpoint.objects.extend_occurrences(
+            before.account_id.tolist(), start_date - timedelta(days=1)
+        )
+        occurrences = pd.DataFrame(
+            TransactionOccurrence.objects.amounts_per_day(
+                before.account_id.tolist(),
+                before.date.min() + timedelta(days=1),
+                start_date - timedelta(days=1),
+            ),
+            columns=["account_id", "date", "amount"],
+        ).merge(
+            before[["account_id", "date"]], on="account_id", suffixes=("", "_state")
+        )
+        occurrences = occurrences[occurrences.date > occurrences.date_state]
+        after_state = (
+            occurrences.assign(amount=to_cents(occurrences.amount))
+            .groupby("account_id")
+            .amount.sum()
+        )
+        state_balances[states.index.get_indexer(before.index)] = opening - (
+            before.account_id.map(after_state).fillna(0).to_numpy(np.int64)
+        )
+
+    # Last snapshot taken on or before every row of the same account
+    last = np.searchsorted(state_keys, keys, side="right") - 1
+    has_state = last >= 0
+    has_state[has_state] = (
+        states.account_id.to_numpy(np.int64)[last[has_state]] == account_ids[has_state]
     )
 
-    # TODO maybe cut the dataframe according to start and end
-    # TODO as this can be bigger because of the manual balance updates
-    return df[["amount", "balance", "real_balance", "balance_snapshot"]]
+    real_balance = balance.copy()
+    real_balance[has_state] += (
+        state_amounts[last[has_state]] - state_balances[last[has_state]]
+    )
+
+    snapshot = np.full(len(keys), np.nan, dtype=object)
+    snapshot[positions[in_window]] = states.amount.to_numpy()[in_window]
+
+    result["real_balance"] = cents_to_float(real_balance)
+    result["balance_snapshot"] = snapshot
+    return result
+
+
+def _lttb_positions(values: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest triangle three buckets, computed for all series at once.
+    """
+    series, days = values.shape
+    # Buckets between the first and the last day which are always kept
+    bounds = (np.arange(points - 1) * (days - 2) // (points - 2)) + 1
+    rows = np.arange(series)
+
+    selected = np.zeros((series, points), dtype=np.int64)
+    selected[:, -1] = days - 1
+    previous = np.zeros(series, dtype=np.int64)
+    for bucket in range(points - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        if bucket + 2 < len(bounds):
+            next_x = (end + bounds[bucket + 2] - 1) / 2
+            next_y = values[:, end : bounds[bucket + 2]].mean(axis=1)
+        else:
+            next_x = days - 1
+            next_y = values[:, -1]
+
+        x = np.arange(start, end)
+        previous_y = values[rows, previous][:, np.newaxis]
+        area = np.abs(
+            (previous[:, np.newaxis] - next_x) * (values[:, start:end] - previous_y)
+            - (previous[:, np.newaxis] - x) * (next_y[:, np.newaxis] - previous_y)
+        )
+        previous = start + area.argmax(axis=1)
+        selected[:, bucket + 1] = previous
+    return np.unique(selected)
+
+
+def _min_max_positions(values: np.ndarray, points: int) -> np.ndarray:
+    """
+    Minimum and maximum of every bucket, computed for all series at once.
+    """
+    days = values.shape[1]
+    bounds = np.linspace(0, days, max(points // 2, 1) + 1).astype(np.int64)
+
+    selected = [np.array([0, days - 1])]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        selected.append(start + values[:, start:end].argmin(axis=1))
+        selected.append(start + values[:, start:end].argmax(axis=1))
+    return np.unique(np.concatenate(selected))
+
+
+def downsample_balance(
+    balance: pd.DataFrame,
+    points: int,
+    column: str = "real_balance",
+    method: str = "lttb",
+) -> pd.DataFrame:
+    """
+    Keep only about ``points`` days needed to chart the daily balance.
+
+    Days are selected on ``column`` of every account, by largest triangle
+    three buckets (``lttb``) or by minimum and maximum of every bucket
+    (``min_max``), so peaks and troughs stay visible. Accounts share the
+    budget and rows of the selected days are kept for all of them, so
+    stacked charts still line up.
+
+    Accepts frames indexed by date, or by account and date like results of
+    ``get_real_account_balance``.
+    """
+    if method not in ("lttb", "min_max"):
+        raise ValueError(f"Unknown downsampling method {method}")
+
+    if "account_id" in balance.index.names:
+        grid = balance[column].unstack("account_id")
+    else:
+        grid = balance[[column]]
+
+    if len(grid) <= points:
+        return balance
+    values = grid.to_numpy(dtype=np.float64).T
+    per_series = points // len(values)
+
+    if method == "lttb":
+        positions = _lttb_positions(values, max(per_series, 3))
+    else:
+        positions = _min_max_positions(values, per_series)
+
+    days = balance.index.get_level_values("date")
+    return balance[days.isin(grid.index[positions])]
@@ -0,0 +1,111 @@
+import functools
+import hashlib
+import inspect
+import uuid
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Version shared by all accounts, bumped by changes of tags, categories, ...
+GLOBAL_VERSION = "global"
+
+
+def _version_key(name) -> str:
+    return f"account:version:{name}"
+
+
+def _new_version() -> str:
+    # Random, so a version evicted from the cache is never repeated
+    return uuid.uuid4().hex
+
+
+def get_versions(account_ids: Iterable[int]) -> dict:
+    """
+    Return current data version of given accounts and the global version.
+    """
+    keys = {_version_key(name): name for name in [GLOBAL_VERSION, *account_ids]}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, _new_version(), timeout=None)
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_versions(account_ids: Iterable[int]):
+    """
+    Invalidate cached results of given accounts once the current transaction
+    commits.
+
+    Bumping earlier would let a concurrent request cache the old data under
+    the new version. Versions are replaced instead of incremented, as
+    ``incr`` of the file based cache is not atomic and two concurrent bumps
+    could end up with the same version.
+    """
+    keys = {_version_key(name): _new_version() for name in set(account_ids)}
+    transaction.on_commit(lambda: cache.set_many(keys, timeout=None))
+
+
+def bump_global_version():
+    """
+    Invalidate cached results of all accounts.
+    """
+    bump_versions([GLOBAL_VERSION])
+
+
+def versioned_key(name: str, account_ids: Iterable[int], *arguments) -> str:
+    """
+    Cache key of a result computed from data of given accounts.
+
+    The key changes whenever data of any of the accounts or the shared data
+    change, so stale results are never read again.
+    """
+    account_ids = sorted(set(account_ids))
+    versions = get_versions(account_ids)
+    key = ":".join(
+        [
+            name,
+            *(f"{owner}@{versions[owner]}" for owner in [GLOBAL_VERSION, *account_ids]),
+            *map(str, arguments),
+        ]
+    )
+    # Keep keys short for backends limiting their length
+    return f"account:result:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def cached_accounting(func: Callable) -> Callable:
+    """
+    Cache results of an accounting function taking ``accounts`` as the first
+    argument.
+
+    Results are keyed by ids and data versions of the accounts and the rest
+    of the arguments, ``context`` is only a way to compute the result and is
+    not part of the key.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+
+        accounts = list(arguments.arguments["accounts"])
+        arguments.arguments["accounts"] = accounts
+        key = versioned_key(
+            f"{func.__module__}:{func.__qualname__}",
+            [account.id for account in accounts],
+            *(
+                f"{name}={value}"
+                for name, value in arguments.arguments.items()
+                if name not in ("accounts", "context")
+            ),
+        )
+
+        result = cache.get(key)
+        if result is None:
+            result = func(*arguments.args, **arguments.kwargs)
+            cache.set(key, result, timeout=settings.ACCOUNT_CACHE_TIMEOUT)
+        return result
+
+    return wrapper
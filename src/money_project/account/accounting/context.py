@@ -0,0 +1,78 @@
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from ..models import MoneyAccountModel
+from ..models.transaction import BaseTransactionManager
+
+
+class AccountingContext:
+    """
+    Transaction frame shared by accounting functions within one request.
+
+    Occurrences are expanded once for all ``accounts`` over the whole
+    ``start_date`` - ``end_date`` range, accounting functions then slice the
+    frame for their own accounts and dates instead of building it again.
+    """
+
+    def __init__(
+        self, accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    ):
+        self.accounts = list(accounts)
+        self.start_date = start_date
+        self.end_date = end_date
+
+        self._frame: Optional[pd.DataFrame] = None
+        self._mirrored: Optional[np.ndarray] = None
+
+    def _build(self):
+        columns = BaseTransactionManager.build_columns_all(
+            self.accounts, self.start_date, self.end_date
+        )
+        self._mirrored = columns["mirrored"]
+        self._frame = BaseTransactionManager.columns_to_dataframe(columns)
+
+    def get_transactions(
+        self, accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    ) -> pd.DataFrame:
+        """
+        Return the same frame as ``BaseTransactionManager.build_dataframe_all``.
+        """
+        account_ids = [account.id for account in accounts]
+        if not set(account_ids) <= {account.id for account in self.accounts}:
+            raise ValueError("Accounts are not part of the accounting context")
+        if start_date < self.start_date or end_date > self.end_date:
+            raise ValueError(
+                f"Range {start_date} - {end_date} is not part of the accounting "
+                f"context {self.start_date} - {self.end_date}"
+            )
+
+        if self._frame is None:
+            self._build()
+        df = self._frame
+
+        # Transfers from other accounts are included too, but only rows which
+        # were not created by mirroring a transfer to one of these accounts
+        target = df.account_id.isin(account_ids)
+        counterparty = df.counter_party_account_id.isin(account_ids)
+        rows = (
+            (target | (counterparty & ~self._mirrored))
+            & (df.date >= start_date)
+            & (df.date <= end_date)
+        )
+        return df[rows].reset_index(drop=True)
+
+
+def get_transactions(
+    accounts: list[MoneyAccountModel],
+    start_date: date,
+    end_date: date,
+    context: Optional[AccountingContext] = None,
+) -> pd.DataFrame:
+    if context is None:
+        return BaseTransactionManager.build_dataframe_all(
+            accounts, start_date, end_date
+        )
+    return context.get_transactions(accounts, start_date, end_date)
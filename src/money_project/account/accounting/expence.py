@@ -1,67 +1,78 @@
 from datetime import date
+from typing import Optional
 
 import pandas as pd
 
 from ..models import MoneyAccountModel
-from ..models.transaction import BaseTransactionManager
-
+from .cache import cached_accounting
+from .context import AccountingContext, get_transactions
+from .money import from_cents
 
 # FIXME implement ignored transactinos?
 
 
+def _fill_missing_category(df: pd.DataFrame) -> pd.DataFrame:
+    categories = df.category.cat.categories.union(["-"])
+    return df.assign(category=df.category.cat.set_categories(categories).fillna("-"))
+
+
+def _sum_amounts(df: pd.DataFrame, by: list) -> pd.DataFrame:
+    # Sum exact cents natively and convert back to decimals once per group
+    result = df.groupby(by, observed=True)[["amount_cents"]].sum()
+    return pd.DataFrame({"amount": from_cents(result.amount_cents)}, index=result.index)
+
+
+@cached_accounting
 def get_expenses_per_category(
-    accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    accounts: list[MoneyAccountModel],
+    start_date: date,
+    end_date: date,
+    context: Optional[AccountingContext] = None,
 ) -> pd.DataFrame:
-    df = BaseTransactionManager.build_dataframe_all(accounts, start_date, end_date)
-    try:
-        df = df[df.amount < 0]
-    except AttributeError:
-        return df
-
-    df.category.fillna("-", inplace=True)
-    return df.groupby(["account", "category"])[["amount"]].sum()
+    df = get_transactions(accounts, start_date, end_date, context)
+    df = df[df.amount_cents < 0]
+    df = _fill_missing_category(df)
+    return _sum_amounts(df, ["account", "category"])
 
 
+@cached_accounting
 def get_expenses_per_category_per_month(
-    accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    accounts: list[MoneyAccountModel],
+    start_date: date,
+    end_date: date,
+    context: Optional[AccountingContext] = None,
 ) -> pd.DataFrame:
-    df = BaseTransactionManager.build_dataframe_all(accounts, start_date, end_date)
-    try:
-        df = df[df.amount < 0]
-    except AttributeError:
-        return df
-
-    df.category.fillna("-", inplace=True)
+    df = get_transactions(accounts, start_date, end_date, context)
+    df = df[df.amount_cents < 0]
+    df = _fill_missing_category(df)
     df["date"] = pd.to_datetime(df["date"])
-    return df.groupby(["account", "category", pd.Grouper(freq="ME", key="date")])[
-        ["amount"]
-    ].sum()
+    return _sum_amounts(df, ["account", "category", pd.Grouper(freq="ME", key="date")])
 
 
+@cached_accounting
 def get_expenses_per_tag(
-    accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    accounts: list[MoneyAccountModel],
+    start_date: date,
+    end_date: date,
+    context: Optional[AccountingContext] = None,
 ) -> pd.DataFrame:
-    df = BaseTransactionManager.build_dataframe_all(accounts, start_date, end_date)
-    try:
-        df = df[df.amount < 0]
-    except AttributeError:
-        return df
-
+    df = get_transactions(accounts, start_date, end_date, context)
+    df = df[df.amount_cents < 0]
     df = df.explode(["tags", "tag_ids"], ignore_index=True)
-    return df.groupby(["account", "tags", "tag_ids"])[["amount"]].sum()
+    return _sum_amounts(df, ["account", "tags", "tag_ids"])
 
 
+@cached_accounting
 def get_expenses_per_tag_per_month(
-    accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    accounts: list[MoneyAccountModel],
+    start_date: date,
+    end_date: date,
+    context: Optional[AccountingContext] = None,
 ) -> pd.DataFrame:
-    df = BaseTransactionManager.build_dataframe_all(accounts, start_date, end_date)
-    try:
-        df = df[df.amount < 0]
-    except AttributeError:
-        return df
-
+    df = get_transactions(accounts, start_date, end_date, context)
+    df = df[df.amount_cents < 0]
     df = df.explode(["tags", "tag_ids"], ignore_index=True)
     df["date"] = pd.to_datetime(df["date"])
-    return df.groupby(
-        ["account", "tags", "tag_ids", pd.Grouper(freq="ME", key="date")]
-    )[["amount"]].sum()
+    return _sum_amounts(
+        df, ["account", "tags", "tag_ids", pd.Grouper(freq="ME", key="date")]
+    )
@@ -0,0 +1,107 @@
+from decimal import Decimal
+import functools
+import math
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+import numpy as np
+
+# Amounts are stored with two decimal places, analytics work in minor units
+CENTS = 100
+
+
+def to_cents(amounts: Iterable[Decimal]) -> np.ndarray:
+    """
+    Convert decimal amounts into an ``int64`` array of cents without rounding.
+    """
+    amounts = list(amounts)
+    return np.fromiter(
+        (int(amount.scaleb(2)) for amount in amounts),
+        dtype=np.int64,
+        count=len(amounts),
+    )
+
+
+def from_cents(cents: Iterable[int]) -> np.ndarray:
+    """
+    Convert cents back into an object array of ``Decimal`` amounts.
+    """
+    # Amounts repeat a lot, create every distinct decimal only once
+    values, inverse = np.unique(np.asarray(cents, dtype=np.int64), return_inverse=True)
+    decimals = np.empty(len(values), dtype=object)
+    decimals[:] = [Decimal(int(value)).scaleb(-2) for value in values]
+    return decimals[inverse]
+
+
+def cents_to_float(cents: np.ndarray) -> np.ndarray:
+    """
+    Convert cents into ``float64`` amounts for charts and ratios.
+    """
+    return np.asarray(cents, dtype=np.int64) / CENTS
+
+
+def _round_tenths(cents):
+    """
+    Round absolute amounts in cents to tenths, half to even.
+
+    Works on plain integers as well as on whole arrays.
+    """
+    tenths, remainder = divmod(abs(cents), 10)
+    return tenths + ((remainder > 5) | ((remainder == 5) & (tenths % 2 == 1)))
+
+
+@dataclass(frozen=True)
+class CurrencyFormatter:
+    """
+    Formats amounts of one currency, e.g. ``$1 234.5 USD``.
+
+    Amounts are rounded to one decimal place, half to even on their exact
+    value in cents, and the decimal part is dropped when it is zero.
+    """
+
+    prefix: str = ""
+    suffix: str = ""
+
+    @functools.cached_property
+    def _template(self) -> Callable[[float], str]:
+        prefix = self.prefix or ""
+        suffix = f" {self.suffix}" if self.suffix else ""
+        return f"{prefix}{{:,.1f}}{suffix}".format
+
+    def _format_rounded(self, value: float) -> str:
+        return self._template(value).replace(",", " ").replace(".0", "")
+
+    def format_many(self, amounts: Iterable) -> np.ndarray:
+        """
+        Format a whole array or series of amounts at once.
+
+        Rounding is computed on the whole array, every distinct amount is then
+        formatted only once.
+        """
+        values = np.asarray(amounts, dtype=np.float64)
+        missing = np.isnan(values)
+        cents = np.rint(np.where(missing, 0, values) * CENTS).astype(np.int64)
+
+        tenths = _round_tenths(cents)
+        # Keep the sign of amounts rounded to zero, e.g. -0.04 is "-0"
+        keys = tenths * 2 + (values < 0)
+
+        unique, inverse = np.unique(keys, return_inverse=True)
+        rounded = np.where(unique % 2 == 1, -(unique // 2 / 10), unique // 2 / 10)
+        texts = np.empty(len(unique), dtype=object)
+        texts[:] = [self._format_rounded(value) for value in rounded.tolist()]
+
+        result = texts[inverse]
+        result[missing] = self._template(np.nan)
+        return result
+
+    def __call__(self, amount) -> str:
+        """
+        Format a single amount the same way as ``format_many``.
+        """
+        value = float(amount)
+        if math.isnan(value):
+            return self._template(value)
+
+        rounded = _round_tenths(round(value * CENTS)) / 10
+        return self._format_rounded(-rounded if value < 0 else rounded)
@@ -0,0 +1,174 @@
+import dataclasses
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Number of months between two occurrences of month based periods
+MONTH_STEPS = {
+    "Yearly": 12,
+    "Half-Yearly": 6,
+    "Quarterly": 3,
+    "Monthly": 1,
+}
+
+# Number of days between two occurrences of day based periods
+DAY_STEPS = {
+    "Weekly": 7,
+    "Daily": 1,
+}
+
+WORK_DAY = "Work-Day"
+
+
+def _month_index(day: date) -> int:
+    return day.year * 12 + day.month - 1
+
+
+@dataclasses.dataclass(frozen=True)
+class Recurrence:
+    """
+    Occurrences of a regular transaction computed directly from its schedule.
+
+    The n-th occurrence is ``start`` shifted by n periods, month based periods
+    are clamped to the last day of shorter months (31st of January is billed
+    on 29th of February and again on 31st of March). Work-Day schedules are
+    billed on ``start`` and then every business day after it.
+    """
+
+    period: str
+    start: date
+    end: Optional[date] = None
+
+    def __post_init__(self):
+        if self.period not in (*MONTH_STEPS, *DAY_STEPS, WORK_DAY):
+            raise ValueError(f"Unknown period: {self.period}")
+
+    def _month_dates(self, months: np.ndarray) -> np.ndarray:
+        first_day = np.datetime64(self.start, "M") + months
+        days_in_month = (
+            (first_day + 1).astype("datetime64[D]") - first_day.astype("datetime64[D]")
+        ).astype(int)
+        day = np.minimum(self.start.day, days_in_month)
+        return first_day.astype("datetime64[D]") + (day - 1)
+
+    def first_on_or_after_many(self, days: Iterable[date]) -> np.ndarray:
+        """
+        Return the first occurrence falling on or after each of ``days``.
+
+        The result is a ``datetime64[D]`` array, ``NaT`` marks days after the
+        last occurrence.
+        """
+        days = np.asarray(days, dtype="datetime64[D]")
+        start = np.datetime64(self.start, "D")
+
+        if step := DAY_STEPS.get(self.period):
+            periods = np.maximum(0, -(-(days - start).astype(int) // step))
+            result = start + periods * step
+        elif step := MONTH_STEPS.get(self.period):
+            months = days.astype("datetime64[M]") - np.datetime64(self.start, "M")
+            periods = np.maximum(0, months.astype(int) // step)
+            result = self._month_dates(periods * step)
+            result = np.where(
+                result < days, self._month_dates((periods + 1) * step), result
+            )
+        else:
+            result = np.where(
+                days <= start, start, np.busday_offset(days, 0, roll="forward")
+            )
+
+        if self.end is not None:
+            result = np.where(
+                result > np.datetime64(self.end, "D"), np.datetime64("NaT"), result
+            )
+        return result.astype("datetime64[D]")
+
+    def last_before_many(self, days: Iterable[date]) -> np.ndarray:
+        """
+        Return the last occurrence falling strictly before each of ``days``.
+
+        The result is a ``datetime64[D]`` array, ``NaT`` marks days on or
+        before the first occurrence.
+        """
+        days = np.asarray(days, dtype="datetime64[D]") - 1
+        start = np.datetime64(self.start, "D")
+
+        if step := DAY_STEPS.get(self.period):
+            periods = (days - start).astype(int) // step
+            result = start + periods * step
+        elif step := MONTH_STEPS.get(self.period):
+            months = days.astype("datetime64[M]") - np.datetime64(self.start, "M")
+            periods = months.astype(int) // step
+            result = self._month_dates(periods * step)
+            result = np.where(
+                result > days, self._month_dates((periods - 1) * step), result
+            )
+        else:
+            result = np.maximum(start, np.busday_offset(days, 0, roll="backward"))
+
+        result = np.where(days < start, np.datetime64("NaT"), result)
+        if self.end is not None:
+            # Occurrences are ordered, nothing after the end can be billed
+            unbounded = dataclasses.replace(self, end=None)
+            last = unbounded.last_before_many([self.end + timedelta(days=1)])
+            result = np.minimum(result, last)
+        return result.astype("datetime64[D]")
+
+    def first_on_or_after(self, day: date) -> Optional[date]:
+        """
+        Return the first occurrence falling on ``day`` or later.
+        """
+        return self.first_on_or_after_many([day])[0].item()
+
+    def last_before(self, day: date) -> Optional[date]:
+        """
+        Return the last occurrence falling strictly before ``day``.
+        """
+        return self.last_before_many([day])[0].item()
+
+    def occurrences(self, start_date: date, end_date: date) -> pd.DatetimeIndex:
+        """
+        Return all occurrences within ``start_date`` and ``end_date`` inclusive.
+        """
+        return pd.DatetimeIndex(
+            self.occurrence_dates(start_date, end_date).astype("datetime64[ns]")
+        )
+
+    def occurrence_dates(self, start_date: date, end_date: date) -> np.ndarray:
+        """
+        Same as ``occurrences`` but returns a plain ``datetime64[D]`` array.
+        """
+        first = max(start_date, self.start)
+        last = end_date if self.end is None else min(end_date, self.end)
+        if first > last:
+            return np.empty(0, dtype="datetime64[D]")
+
+        if step := DAY_STEPS.get(self.period):
+            periods = -(-(first - self.start).days // step)
+            first = self.start + timedelta(days=periods * step)
+            dates = np.arange(
+                np.datetime64(first, "D"),
+                np.datetime64(last, "D") + 1,
+                step,
+                dtype="datetime64[D]",
+            )
+        elif step := MONTH_STEPS.get(self.period):
+            months_first = (_month_index(first) - _month_index(self.start)) // step
+            months_last = (_month_index(last) - _month_index(self.start)) // step
+            dates = self._month_dates(np.arange(months_first, months_last + 1) * step)
+            dates = dates[
+                (dates >= np.datetime64(first, "D"))
+                & (dates <= np.datetime64(last, "D"))
+            ]
+        else:
+            dates = np.arange(
+                np.datetime64(max(first, self.start + timedelta(days=1)), "D"),
+                np.datetime64(last, "D") + 1,
+                dtype="datetime64[D]",
+            )
+            dates = dates[np.is_busday(dates)]
+            if first == self.start:
+                dates = np.concatenate([[np.datetime64(self.start, "D")], dates])
+
+        return dates
@@ -0,0 +1,45 @@
+from datetime import date
+
+from django import forms
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+# Range of supported window dates, occurrences are expanded and stored from
+# the beginning of all schedules up to the end of the window
+EARLIEST_DATE = date(1900, 1, 1)
+LATEST_DATE = date(2099, 12, 31)
+
+
+class DashboardWindowForm(forms.Form):
+    """
+    Date window of dashboard charts, read from the query string.
+
+    Missing dates default to the previous and the current year.
+    """
+
+    start = forms.DateField(
+        required=False,
+        validators=[MinValueValidator(EARLIEST_DATE), MaxValueValidator(LATEST_DATE)],
+    )
+    end = forms.DateField(
+        required=False,
+        validators=[MinValueValidator(EARLIEST_DATE), MaxValueValidator(LATEST_DATE)],
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+
+        today = date.today()
+        cleaned_data["start"] = cleaned_data.get("start") or date(today.year - 1, 1, 1)
+        cleaned_data["end"] = cleaned_data.get("end") or date(today.year, 12, 31)
+        if cleaned_data["start"] > cleaned_data["end"]:
+            raise forms.ValidationError("Start of the window is after its end")
+        if (
+            cleaned_data["end"] - cleaned_data["start"]
+        ).days >= settings.ACCOUNT_WINDOW_MAX_DAYS:
+            raise forms.ValidationError(
+                f"Window is longer than {settings.ACCOUNT_WINDOW_MAX_DAYS} days"
+            )
+        return cleaned_data
@@ -15,20 +15,30 @@ class Command(BaseCommand):
         parser.add_argument("--ideal", action=argparse.BooleanOptionalAction)
         parser.add_argument("--start-date", type=str)
         parser.add_argument("--end-date", type=str)
+        parser.add_argument(
+            "--from-checkpoint", action=argparse.BooleanOptionalAction, default=True
+        )
 
     def handle(self, *args, **options):
         accounts = options["accounts"]
         ideal = options["ideal"]
+        from_checkpoint = options["from_checkpoint"]
         start_date = datetime.strptime(options["start_date"], "%Y-%m-%d").date()
         end_date = datetime.strptime(options["end_date"], "%Y-%m-%d").date()
 
         if ideal:
             result = get_ideal_account_balance(
-                MoneyAccountModel.objects.filter(id__in=accounts), start_date, end_date
+                MoneyAccountModel.objects.filter(id__in=accounts),
+                start_date,
+                end_date,
+                from_checkpoint=from_checkpoint,
             )
         else:
             result = get_real_account_balance(
-                MoneyAccountModel.objects.filter(id__in=accounts), start_date, end_date
+                MoneyAccountModel.objects.filter(id__in=accounts),
+                start_date,
+                end_date,
+                from_checkpoint=from_checkpoint,
             )
 
         self.stdout.write(
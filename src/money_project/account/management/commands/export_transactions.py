@@ -22,7 +22,7 @@ class Command(BaseCommand):
             MoneyAccountModel.objects.filter(id__in=accounts),
             start_date,
             end_date,
-        )
+        ).drop(columns=["amount_cents"])
 
         self.stdout.write(
             result.to_csv(index=False, header=True, date_format="%Y-%m-%d")
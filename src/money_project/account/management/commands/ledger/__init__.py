@@ -1,4 +1,7 @@
-from typing import Iterable, Optional
+import calendar
+import datetime
+import heapq
+from typing import Iterable, Iterator, Optional
 
 from account.management.commands.ledger.base import (
     AmountSpecific,
@@ -66,25 +69,25 @@ def parse_source(transaction: BaseTransactionModel) -> Iterable[Posting]:
         yield Posting(
             account=parse_account_name(transaction.counterparty_account),
             amount=AmountTransfer(amount=-transaction.amount, currency=currency),
-            tags=[],
+            tags=(),
         )
     elif name := transaction.get_ledger():
         yield Posting(
             account=name,
             amount=AmountTransfer(amount=-transaction.amount, currency=currency),
-            tags=[],
+            tags=(),
         )
     elif transaction.amount < 0:
         yield Posting(
             account=parse_expense_name(transaction.name, transaction.category, tags),
             amount=AmountTransfer(amount=-transaction.amount, currency=currency),
-            tags=[],
+            tags=(),
         )
     else:
         yield Posting(
             account=parse_income_name(transaction.name, transaction.category, tags),
             amount=AmountTransfer(amount=-transaction.amount, currency=currency),
-            tags=[],
+            tags=(),
         )
 
 
@@ -99,7 +102,7 @@ def parse_posting(transaction: BaseTransactionModel) -> Iterable[Posting]:
     #             amount=AmountTransfer(
     #                 amount=Decimal(1000), currency=transaction.currency.name
     #             ),
-    #             tags=[],
+    #             tags=(),
     #         )
     #         source.amount.amount -= 1000
 
@@ -108,14 +111,14 @@ def parse_posting(transaction: BaseTransactionModel) -> Iterable[Posting]:
     yield Posting(
         account=parse_account_name(transaction.target_account),
         amount=None,
-        tags=[],
+        tags=(),
     )
 
 
 def extra_transaction_ledger(
     transaction: ExtraTransactionModel,
 ) -> Iterable[BaseLedger]:
-    tags = [
+    tags = tuple(
         t
         for t in (
             [t.name for t in transaction.tag.all()]
@@ -127,13 +130,13 @@ def extra_transaction_ledger(
             ]
         )
         if t is not None
-    ]
-    postings = list(parse_posting(transaction))
+    )
+    postings = tuple(parse_posting(transaction))
 
     yield TransactionLedger(
         id=str(transaction.id),
         name=transaction.name.strip(),
-        description=transaction.description.strip(),
+        description=(transaction.description or "").strip(),
         tags=tags,
         postings=postings,
         date=transaction.date,
@@ -143,7 +146,7 @@ def extra_transaction_ledger(
 def regular_transaction_ledger(
     transaction: RegularTransactionModel,
 ) -> Iterable[BaseLedger]:
-    tags = [
+    tags = tuple(
         t
         for t in (
             [t.name for t in transaction.tag.all()]
@@ -156,17 +159,17 @@ def regular_transaction_ledger(
             ]
         )
         if t is not None
-    ]
-    postings = list(parse_posting(transaction))
+    )
+    postings = tuple(parse_posting(transaction))
 
     period = {
         "Yearly": "yearly",
         "Quarterly": "quarterly",
-        "Half-Yearly": "every 2 months",
+        "Half-Yearly": "every 6 months",
         "Monthly": "monthly",
         "Weekly": "weekly",
         "Daily": "daily",
-        # TODO support workdays by yielding multiple entities
+        # Heading only, occurrences are generated from the recurrence
         "Work-Day": "daily",
     }[str(transaction.period)]
     billing_start = transaction.billing_start
@@ -175,24 +178,25 @@ def regular_transaction_ledger(
     yield RegularTransactionLedger(
         id=str(transaction.id),
         name=transaction.name.strip(),
-        description=transaction.description.strip(),
+        description=(transaction.description or "").strip(),
         tags=tags,
         postings=postings,
         date=billing_start,
         period=period,
         billing_end=billing_end,
+        recurrence=transaction.recurrence,
     )
 
 
 def manual_account_state_ledger(state: ManualAccountStateModel) -> Iterable[BaseLedger]:
-    postings = [
+    postings = (
         Posting(
             account=parse_account_name(state.account),
             amount=AmountSpecific(state.amount, currency=state.account.currency.name),
-            tags=[],
+            tags=(),
         ),
-        Posting(account="Equity:Adjustments", amount=None, tags=[]),
-    ]
+        Posting(account="Equity:Adjustments", amount=None, tags=()),
+    )
 
     name = f"Manual adjustment for account {state.account.name} on {state.date}"
 
@@ -200,7 +204,7 @@ def manual_account_state_ledger(state: ManualAccountStateModel) -> Iterable[Base
         id=f"manual_{state.id}",
         name=name,
         description="",
-        tags=[("name", name)],
+        tags=(("name", name),),
         postings=postings,
         date=state.date,
     )
@@ -225,3 +229,55 @@ def manual_account_state_ledgers(
 ) -> Iterable[TransactionLedger]:
     for state in states:
         yield from manual_account_state_ledger(state)
+
+
+def month_end(day: datetime.date) -> datetime.date:
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def months_between(
+    start_date: datetime.date, end_date: datetime.date
+) -> list[datetime.date]:
+    """
+    First days of all months between given dates inclusive.
+    """
+    return [
+        datetime.date(
+            start_date.year + (start_date.month + i - 1) // 12,
+            (start_date.month + i - 1) % 12 + 1,
+            1,
+        )
+        for i in range(
+            (end_date.year - start_date.year) * 12
+            + end_date.month
+            - start_date.month
+            + 1
+        )
+    ]
+
+
+def regular_transaction_occurrences(
+    transaction: RegularTransactionLedger,
+    start_date: datetime.date,
+    end_date: datetime.date,
+) -> Iterable[TransactionLedger]:
+    """
+    Expand a regular transaction into its occurrences between given dates.
+    """
+    # Dates are computed a year at a time, long exports hold only a year of
+    # dates of every schedule
+    for year in range(start_date.year, end_date.year + 1):
+        yield from transaction.generate_transactions(
+            max(start_date, datetime.date(year, 1, 1)),
+            min(end_date, datetime.date(year, 12, 31)),
+        )
+
+
+def merge_ledgers(*sources: Iterable[TransactionLedger]) -> Iterator[TransactionLedger]:
+    """
+    Merge sources ordered by date into a single stream ordered by date.
+
+    Only the next entry of every source is held in memory. Entries of the same
+    date keep the order of their sources, as with a stable sort of all of them.
+    """
+    return heapq.merge(*sources, key=lambda ledger: ledger.date)
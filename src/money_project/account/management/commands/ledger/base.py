@@ -1,5 +1,4 @@
 import abc
-import calendar
 import dataclasses
 import datetime
 import textwrap
@@ -8,6 +7,8 @@ from copy import deepcopy
 from decimal import Decimal
 from typing import Optional
 
+from account.accounting.recurrence import Recurrence
+
 
 def format_tag(tag: str | tuple[str, str]) -> str:
     if isinstance(tag, tuple):
@@ -16,14 +17,14 @@ def format_tag(tag: str | tuple[str, str]) -> str:
         return f"  ; :{tag}:"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class Amount(abc.ABC):
     @abc.abstractmethod
     def __str__(self) -> str:
         pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class AmountTransfer(Amount):
     amount: Decimal
     currency: str
@@ -32,7 +33,7 @@ class AmountTransfer(Amount):
         return f"{self.amount} {self.currency}"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class AmountSpecific(Amount):
     amount: Decimal
     currency: str
@@ -41,11 +42,11 @@ class AmountSpecific(Amount):
         return f"={self.amount} {self.currency}"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class Posting:
     account: str
     amount: Optional[Amount]
-    tags: list[str | tuple[str, str]]
+    tags: tuple[str | tuple[str, str], ...]
 
     def __str__(self) -> str:
         tags = "\n".join([format_tag(t) for t in self.tags])
@@ -58,20 +59,20 @@ class Posting:
         ).strip()
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class BaseLedger(abc.ABC):
     id: str
     name: str
     description: Optional[str]
-    tags: list[str | tuple[str, str]]
-    postings: list[Posting]
+    tags: tuple[str | tuple[str, str], ...]
+    postings: tuple[Posting, ...]
 
     @abc.abstractmethod
     def __str__(self) -> str:
         pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class TransactionLedger(BaseLedger):
     date: datetime.date
 
@@ -104,10 +105,11 @@ class TransactionLedger(BaseLedger):
         return "\n".join(result)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class RegularTransactionLedger(TransactionLedger):
     period: str
     billing_end: Optional[datetime.date]
+    recurrence: Recurrence
 
     def get_heading(self) -> str:
         # ~ Monthly Rent Payment (2024-01 to 2024-12)
@@ -116,47 +118,23 @@ class RegularTransactionLedger(TransactionLedger):
         else:
             return f"~ {self.period} {self.date}"
 
+    def occurrence(self, date: datetime.date) -> TransactionLedger:
+        # Occurrences share tags and postings of the schedule instead of
+        # copying them, both are immutable
+        return TransactionLedger(
+            id=self.id,
+            name=self.name,
+            description=self.description,
+            tags=self.tags,
+            postings=self.postings,
+            date=date,
+        )
+
     def generate_transactions(
-        self, month: datetime.date
+        self, start_date: datetime.date, end_date: datetime.date
     ) -> Iterable[TransactionLedger]:
-        if self.date > month.replace(
-            day=calendar.monthrange(month.year, month.month)[1]
-        ):
-            return
-
-        if self.period == "monthly":
-            entity = self.copy()
-            date = entity.date.replace(month=month.month, year=month.year)
-            if self.billing_end is not None and date > self.billing_end:
-                return
-            entity.date = date
-            yield entity
-        elif self.period == "daily":
-            number_of_days = calendar.monthrange(month.year, month.month)[1]
-            for day in range(1, number_of_days):
-                date = datetime.date(month.year, month.month, day)
-                if self.billing_end is not None and date > self.billing_end:
-                    return
-                entity = self.copy()
-                entity.date = date
-                yield entity
-        elif self.period == "weekly":
-            start = self.date.replace(month=month.month, year=month.year)
-            for shift in range(0, 4):
-                date = start + datetime.timedelta(days=shift * 7)
-                if self.billing_end is not None and date > self.billing_end:
-                    return
-                if date.month == month.month:
-                    entity = self.copy()
-                    entity.date = date
-                    yield entity
-        elif self.period == "yearly":
-            if self.date.month == month.month and self.date.year == month.year:
-                entity = self.copy()
-                date = entity.date.replace(year=month.year)
-                if self.billing_end is not None and date > self.billing_end:
-                    return
-                entity.date = date
-                yield entity
-        else:
-            raise ValueError(f"Unknown period: {self.period}")
+        """
+        Generate occurrences between given dates inclusive, ordered by date.
+        """
+        for date in self.recurrence.occurrence_dates(start_date, end_date).tolist():
+            yield self.occurrence(date)
@@ -0,0 +1,174 @@
+import dataclasses
+import datetime
+import os
+from typing import Iterator, Optional
+
+import django
+from django.apps import apps
+from django.db.models import Prefetch, Q
+from django.utils.text import slugify
+
+from account.management.commands import ledger
+from account.management.commands.ledger.base import TransactionLedger
+from account.management.commands.ledger.writer import LedgerWriter
+from account.models import (
+    ExtraTransactionModel,
+    ManualAccountStateModel,
+    MoneyAccountModel,
+    RegularTransactionModel,
+    TagModel,
+)
+
+# Number of rows fetched from the database at once while streaming
+CHUNK_SIZE = 2000
+
+# Relations read while converting transactions to ledger entries
+TRANSACTION_RELATIONS = [
+    "ledger_name",
+    "category__ledger_name",
+    "category__parent",
+    "target_account__currency",
+    "target_account__ledger_name",
+    "counterparty_account__ledger_name",
+]
+
+SPLIT_BY = ["year", "month", "account"]
+
+
+def transaction_tags() -> Prefetch:
+    return Prefetch("tag", queryset=TagModel.objects.select_related("ledger_name"))
+
+
+@dataclasses.dataclass(frozen=True)
+class Partition:
+    """
+    Part of the exported ledger written into its own journal file.
+
+    Covers entries between ``start_date`` and ``end_date`` inclusive, only of
+    ``account_id`` when it is set.
+    """
+
+    name: str
+    start_date: datetime.date
+    end_date: datetime.date
+    account_id: Optional[int] = None
+
+    @property
+    def file_name(self) -> str:
+        return f"{self.name}.journal"
+
+
+def build_partitions(
+    start_date: datetime.date, end_date: datetime.date, split_by: Optional[str]
+) -> list[Partition]:
+    if split_by is None:
+        return [Partition("ledger", start_date, end_date)]
+
+    if split_by == "account":
+        return [
+            Partition(f"{account_id}-{slugify(name)}", start_date, end_date, account_id)
+            for account_id, name in MoneyAccountModel.objects.order_by(
+                "id"
+            ).values_list("id", "name")
+        ]
+
+    if split_by == "year":
+        return [
+            Partition(
+                str(year),
+                max(start_date, datetime.date(year, 1, 1)),
+                min(end_date, datetime.date(year, 12, 31)),
+            )
+            for year in range(start_date.year, end_date.year + 1)
+        ]
+
+    if split_by == "month":
+        return [
+            Partition(
+                month.strftime("%Y-%m"),
+                max(start_date, month),
+                min(end_date, ledger.month_end(month)),
+            )
+            for month in ledger.months_between(start_date, end_date)
+        ]
+
+    raise ValueError(f"Unknown split: {split_by}")
+
+
+def partition_ledgers(partition: Partition) -> Iterator[TransactionLedger]:
+    """
+    Stream entries of a partition of the export by date.
+
+    Regular transactions are expanded into all their occurrences within the
+    partition, including schedules started before it.
+    """
+    extra_transactions = ExtraTransactionModel.objects.filter(
+        Q(date__gte=partition.start_date) & Q(date__lte=partition.end_date)
+    )
+    regular_transactions = RegularTransactionModel.objects.filter(
+        Q(billing_start__lte=partition.end_date)
+        & (Q(billing_end__isnull=True) | Q(billing_end__gte=partition.start_date))
+    )
+    account_manual_states = ManualAccountStateModel.objects.filter(
+        Q(date__gte=partition.start_date) & Q(date__lte=partition.end_date)
+    )
+    if partition.account_id is not None:
+        extra_transactions = extra_transactions.filter(
+            target_account_id=partition.account_id
+        )
+        regular_transactions = regular_transactions.filter(
+            target_account_id=partition.account_id
+        )
+        account_manual_states = account_manual_states.filter(
+            account_id=partition.account_id
+        )
+
+    extra_transactions = (
+        extra_transactions.select_related(*TRANSACTION_RELATIONS)
+        .prefetch_related(transaction_tags())
+        .order_by("date", "id")
+    )
+    regular_transactions = (
+        regular_transactions.select_related(*TRANSACTION_RELATIONS)
+        .prefetch_related(transaction_tags())
+        .order_by("billing_start", "id")
+    )
+    account_manual_states = account_manual_states.select_related(
+        "account__currency", "account__ledger_name"
+    ).order_by("date", "id")
+
+    # Every source is ordered by date, they are merged while being written
+    # instead of collecting and sorting all entries first
+    regular = [
+        ledger.regular_transaction_occurrences(
+            r, partition.start_date, partition.end_date
+        )
+        for r in ledger.regular_transaction_ledgers(regular_transactions)
+    ]
+    return ledger.merge_ledgers(
+        ledger.manual_account_state_ledgers(
+            account_manual_states.iterator(chunk_size=CHUNK_SIZE)
+        ),
+        *regular,
+        ledger.extra_transaction_ledgers(
+            extra_transactions.iterator(chunk_size=CHUNK_SIZE)
+        ),
+    )
+
+
+def write_partition(directory: str, partition: Partition) -> str:
+    """
+    Write a partition into its journal file in ``directory``.
+
+    Runs in worker processes of parallel exports as well.
+    """
+    path = os.path.join(directory, partition.file_name)
+    with open(path, "w") as stream, LedgerWriter(stream) as writer:
+        writer.write_all(partition_ledgers(partition))
+    return path
+
+
+def setup_worker() -> None:
+    # Workers started by spawn or forkserver do not inherit configured Django
+    if not apps.ready:
+        django.setup()
@@ -0,0 +1,188 @@
+import bisect
+import datetime
+import hashlib
+import json
+import os
+from typing import Iterable, Optional
+
+from django.db import models
+from django.db.models import Count, Max, Q
+
+from account.management.commands.ledger.export import Partition
+from account.models import (
+    CategoryModel,
+    CurrencyModel,
+    ExtraTransactionModel,
+    LedgerName,
+    ManualAccountStateModel,
+    MoneyAccountModel,
+    RegularTransactionModel,
+    TagModel,
+)
+
+MANIFEST = "manifest.json"
+
+# Bump when the journal format changes, so that every partition is rewritten
+MANIFEST_VERSION = 2
+
+
+def read_manifest(directory: str) -> dict[str, str]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as manifest:
+            return json.load(manifest)["partitions"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return {}
+
+
+def write_manifest(directory: str, hashes: dict[str, str]) -> None:
+    with open(os.path.join(directory, MANIFEST), "w") as manifest:
+        json.dump({"partitions": hashes}, manifest, indent=2, sort_keys=True)
+
+
+def last_changes(model: type[models.Model]) -> dict[int, str]:
+    """
+    Map ids of rows to the time of their last change recorded in history.
+    """
+    return {
+        row_id: last.isoformat()
+        for row_id, last in model.history.order_by()
+        .values("id")
+        .annotate(last=Max("history_date"))
+        .values_list("id", "last")
+    }
+
+
+def shared_state() -> list:
+    """
+    State of rows read by entries of every partition.
+    """
+    state = [
+        model.history.order_by().aggregate(
+            count=Count("history_id"), last=Max("history_date")
+        )
+        for model in [MoneyAccountModel, CategoryModel, TagModel, LedgerName]
+    ]
+    # Currencies have no history, they are few
+    state.append(list(CurrencyModel.objects.order_by("id").values_list("id", "name")))
+    return state
+
+
+class PartitionHasher:
+    """
+    Hashes inputs of partitions of an export.
+
+    Every source row is added to all partitions its entries can fall in,
+    together with the time of its last change. A partition's hash changes when
+    a row is created, changed or deleted, or moves in or out of it.
+    """
+
+    def __init__(self, partitions: list[Partition], seed: str):
+        self.digests = {p.name: hashlib.sha256(seed.encode()) for p in partitions}
+
+        groups: dict[Optional[int], list[Partition]] = {}
+        for partition in sorted(partitions, key=lambda p: p.start_date):
+            groups.setdefault(partition.account_id, []).append(partition)
+        self.groups = {
+            account_id: (
+                [p.start_date for p in group],
+                [p.end_date for p in group],
+                [self.digests[p.name] for p in group],
+            )
+            for account_id, group in groups.items()
+        }
+
+    def add(
+        self,
+        key: str,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        account_id: int,
+    ) -> None:
+        encoded = f"{key}\n".encode()
+        for account in (None, account_id):
+            if account not in self.groups:
+                continue
+            starts, ends, digests = self.groups[account]
+            first = bisect.bisect_left(ends, start_date)
+            last = bisect.bisect_right(starts, end_date)
+            for digest in digests[first:last]:
+                digest.update(encoded)
+
+    def hexdigests(self) -> dict[str, str]:
+        return {name: digest.hexdigest() for name, digest in self.digests.items()}
+
+
+def _add_transactions(
+    hasher: PartitionHasher,
+    model: type[models.Model],
+    rows: Iterable[tuple[int, datetime.date, datetime.date, int]],
+    transactions: models.QuerySet,
+) -> None:
+    changes = last_changes(model)
+    tags = model.objects.get_tag_ids(transactions)
+    name = model.__name__
+    for row_id, start_date, end_date, account_id in rows:
+        key = f"{name}:{row_id}:{changes.get(row_id)}:{sorted(tags.get(row_id, []))}"
+        hasher.add(key, start_date, end_date, account_id)
+
+
+def partition_hashes(
+    partitions: list[Partition], start_date: datetime.date, end_date: datetime.date
+) -> dict[str, str]:
+    """
+    Hash inputs of every partition of an export between given dates.
+
+    Reads ids, dates and history of source rows only, without building any
+    ledger entries.
+    """
+    seed = json.dumps(
+        [MANIFEST_VERSION, start_date, end_date, shared_state()], default=str
+    )
+    hasher = PartitionHasher(partitions, seed)
+
+    extra = ExtraTransactionModel.objects.filter(
+        date__gte=start_date, date__lte=end_date
+    ).order_by("id")
+    _add_transactions(
+        hasher,
+        ExtraTransactionModel,
+        (
+            (row_id, day, day, account_id)
+            for row_id, day, account_id in extra.values_list(
+                "id", "date", "target_account_id"
+            )
+        ),
+        extra,
+    )
+
+    # Same schedules as exported, each can fall into any partition it spans
+    regular = RegularTransactionModel.objects.filter(
+        Q(billing_start__lte=end_date)
+        & (Q(billing_end__isnull=True) | Q(billing_end__gte=start_date))
+    ).order_by("id")
+    _add_transactions(
+        hasher,
+        RegularTransactionModel,
+        (
+            (row_id, billing_start, billing_end or end_date, account_id)
+            for row_id, billing_start, billing_end, account_id in regular.values_list(
+                "id", "billing_start", "billing_end", "target_account_id"
+            )
+        ),
+        regular,
+    )
+
+    changes = last_changes(ManualAccountStateModel)
+    for row_id, day, account_id in (
+        ManualAccountStateModel.objects.filter(date__gte=start_date, date__lte=end_date)
+        .order_by("id")
+        .values_list("id", "date", "account_id")
+    ):
+        hasher.add(
+            f"ManualAccountStateModel:{row_id}:{changes.get(row_id)}",
+            day,
+            day,
+            account_id,
+        )
+
+    return hasher.hexdigests()
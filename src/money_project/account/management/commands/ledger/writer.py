@@ -0,0 +1,48 @@
+from typing import Iterable, TextIO
+
+from account.management.commands.ledger.base import BaseLedger
+
+# Entries are written to the stream in chunks of about this many characters
+BUFFER_SIZE = 64 * 1024
+
+
+class LedgerWriter:
+    """
+    Writes ledger entries to a text stream, separated by two blank lines.
+
+    Entries are collected and written in chunks, so a long export makes a
+    few large writes instead of several small ones per entry.
+    """
+
+    def __init__(self, stream: TextIO, buffer_size: int = BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._buffer: list[str] = []
+        self._buffered = 0
+
+    def write(self, entry: BaseLedger) -> None:
+        text = f"{entry}\n\n\n"
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def write_all(self, entries: Iterable[BaseLedger]) -> None:
+        for entry in entries:
+            self.write(entry)
+        self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            # Chunks always end with a newline, so Django's OutputWrapper
+            # writes them without appending its own line ending
+            self.stream.write("".join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+        self.stream.flush()
+
+    def __enter__(self) -> "LedgerWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.flush()
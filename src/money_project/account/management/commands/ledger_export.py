@@ -1,68 +1,109 @@
+import argparse
 import datetime
-import itertools
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
 
-from django.core.management.base import BaseCommand
-from django.db.models import Q
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connections
 
-from account.models import (
-    ExtraTransactionModel,
-    ManualAccountStateModel,
-    RegularTransactionModel,
-)
-from . import ledger
+from .ledger import export, manifest
+from .ledger.writer import LedgerWriter
+
+# Journal including all partitions of a split export
+MAIN_JOURNAL = "main.journal"
+
+# Options of split exports only
+SPLIT_OPTIONS = ["output", "jobs", "force"]
+
+
+def parse_date(value: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
 
 
 class Command(BaseCommand):
     help = "Exports all data to ledger"
 
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument("--start-date", type=parse_date)
+        parser.add_argument("--end-date", type=parse_date)
+        parser.add_argument(
+            "--split-by",
+            choices=export.SPLIT_BY,
+            help="Write one journal per partition into the output directory",
+        )
+        parser.add_argument(
+            "--output", type=str, help="Output directory of split exports"
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            help="Number of processes writing partitions of split exports "
+            "(default: 1)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rewrite partitions of split exports even when unchanged",
+        )
+
     def handle(self, *args, **options):
-        start_date = datetime.date(2024, 1, 1)
-        end_date = datetime.date(2024, 12, 31)
-
-        extra_transactions = ExtraTransactionModel.objects.filter(
-            Q(date__gte=start_date) & Q(date__lte=end_date)
-        ).order_by("date")
-        regular_transactions = RegularTransactionModel.objects.filter(
-            (Q(billing_start__gte=start_date) & Q(billing_start__lte=end_date))
-        ).order_by("billing_start")
-        account_manual_states = ManualAccountStateModel.objects.filter(
-            Q(date__gte=start_date) & Q(date__lte=end_date)
-        ).order_by("date")
-
-        months = [
-            datetime.date(
-                start_date.year + (start_date.month + i - 1) // 12,
-                (start_date.month + i - 1) % 12 + 1,
-                1,
-            )
-            for i in range(
-                (end_date.year - start_date.year) * 12
-                + end_date.month
-                - start_date.month
-                + 1
-            )
-        ]
+        today = datetime.date.today()
+        start_date = options["start_date"] or datetime.date(today.year, 1, 1)
+        end_date = options["end_date"] or datetime.date(today.year, 12, 31)
+        if start_date > end_date:
+            raise CommandError("Start date is after end date")
+
+        split_by = options["split_by"]
+        partitions = export.build_partitions(start_date, end_date, split_by)
+
+        if split_by is None:
+            for option in SPLIT_OPTIONS:
+                if options[option] not in (None, False):
+                    raise CommandError(f"--{option} requires --split-by")
+            LedgerWriter(self.stdout).write_all(export.partition_ledgers(partitions[0]))
+            return
 
-        # TODO split ledgers to files...
-        regular = list(ledger.regular_transaction_ledgers(regular_transactions))
-        regular_to_transactions = [
-            t
-            for r in regular
-            for month in months
-            for t in r.generate_transactions(month)
+        directory = options["output"]
+        if not directory:
+            raise CommandError("--output is required with --split-by")
+        jobs = 1 if options["jobs"] is None else options["jobs"]
+        if jobs < 1:
+            raise CommandError("--jobs must be at least 1")
+        os.makedirs(directory, exist_ok=True)
+
+        # Partitions whose inputs did not change since the last export are kept
+        hashes = manifest.partition_hashes(partitions, start_date, end_date)
+        previous = {} if options["force"] else manifest.read_manifest(directory)
+        changed = [
+            partition
+            for partition in partitions
+            if previous.get(partition.name) != hashes[partition.name]
+            or not os.path.exists(os.path.join(directory, partition.file_name))
         ]
 
-        ledgers = itertools.chain(
-            # regular,
-            ledger.manual_account_state_ledgers(account_manual_states),
-            regular_to_transactions,
-            ledger.extra_transaction_ledgers(extra_transactions),
-        )
+        write = functools.partial(export.write_partition, directory)
+        if jobs == 1:
+            for partition in changed:
+                write(partition)
+        else:
+            # Forked workers must not share the connection of this process
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=jobs, initializer=export.setup_worker
+            ) as pool:
+                # Partitions are independent, the pool only reports failures
+                list(pool.map(write, changed))
 
-        sorted_ledgers = list(ledgers)
-        sorted_ledgers.sort(key=lambda x: x.date)
+        with open(os.path.join(directory, MAIN_JOURNAL), "w") as main:
+            for partition in partitions:
+                main.write(f"include {partition.file_name}\n")
+        manifest.write_manifest(directory, hashes)
 
-        for element in sorted_ledgers:
-            self.stdout.write(str(element))
-            self.stdout.write("\n")
-            self.stdout.write("\n")
+        self.stdout.write(
+            f"Exported {len(changed)} of {len(partitions)} partitions into "
+            f"{os.path.join(directory, MAIN_JOURNAL)}"
+        )
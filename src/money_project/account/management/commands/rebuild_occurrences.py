@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...accounting.cache import bump_global_version
+from ...models import BalanceCheckpoint, TransactionOccurrence
+
+BATCH_SIZE = 5000
+
+
+def rebuild_occurrences() -> int:
+    """
+    Rebuild occurrences of all transactions and drop all checkpoints.
+
+    Returns the number of created occurrences.
+    """
+    with transaction.atomic():
+        BalanceCheckpoint.objects.all().delete()
+        count = TransactionOccurrence.objects.rebuild(BATCH_SIZE)
+
+    bump_global_version()
+    return count
+
+
+class Command(BaseCommand):
+    help = "Rebuilds materialized occurrences of all transactions"
+
+    def handle(self, *args, **options):
+        count = rebuild_occurrences()
+        self.stdout.write(f"Created {count} occurrences")
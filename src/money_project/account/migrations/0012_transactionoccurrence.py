@@ -0,0 +1,103 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0011_historicalledgername_common_name_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="categorymodel",
+            name="ledger_name",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="account.ledgername",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="extratransactionmodel",
+            name="ledger_name",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="account.ledgername",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="moneyaccountmodel",
+            name="ledger_name",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="account.ledgername",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="regulartransactionmodel",
+            name="ledger_name",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="account.ledgername",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="tagmodel",
+            name="ledger_name",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="account.ledgername",
+            ),
+        ),
+        migrations.CreateModel(
+            name="TransactionOccurrence",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("date", models.DateField()),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("include_in_statistics", models.BooleanField(default=True)),
+                ("model", models.CharField(max_length=50)),
+                ("source_id", models.IntegerField()),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="account.moneyaccountmodel",
+                    ),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="account.categorymodel",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["account", "date"],
+                        name="account_tra_account_d27b3a_idx",
+                    ),
+                    models.Index(
+                        fields=["model", "source_id"],
+                        name="account_tra_model_eeba5b_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0012_transactionoccurrence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BalanceCheckpoint",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("date", models.DateField()),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=14)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="account.moneyaccountmodel",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="balancecheckpoint",
+            constraint=models.UniqueConstraint(
+                fields=("account", "date"), name="unique_balance_checkpoint"
+            ),
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0013_balancecheckpoint"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="historicalcategorymodel",
+            name="history_date",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="historicalextratransactionmodel",
+            name="history_date",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="historicalledgername",
+            name="history_date",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="historicalmanualaccountstatemodel",
+            name="history_date",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="historicalmoneyaccountmodel",
+            name="history_date",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="historicalregulartransactionmodel",
+            name="history_date",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="historicaltagmodel",
+            name="history_date",
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name="extratransactionmodel",
+            index=models.Index(
+                fields=["target_account", "date"], name="account_ext_target__99994f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="extratransactionmodel",
+            index=models.Index(
+                fields=["counterparty_account", "date"],
+                name="account_ext_counter_1b3631_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="historicalcategorymodel",
+            index=models.Index(
+                fields=["history_date", "id"], name="account_his_history_1a2abe_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="historicalextratransactionmodel",
+            index=models.Index(
+                fields=["history_date", "id"], name="account_his_history_12955e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="historicalledgername",
+            index=models.Index(
+                fields=["history_date", "id"], name="account_his_history_435d18_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="historicalmanualaccountstatemodel",
+            index=models.Index(
+                fields=["history_date", "id"], name="account_his_history_f6fefd_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="historicalmoneyaccountmodel",
+            index=models.Index(
+                fields=["history_date", "id"], name="account_his_history_9f0a09_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="historicalregulartransactionmodel",
+            index=models.Index(
+                fields=["history_date", "id"], name="account_his_history_5911cb_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="historicaltagmodel",
+            index=models.Index(
+                fields=["history_date", "id"], name="account_his_history_c2fa7e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="manualaccountstatemodel",
+            index=models.Index(
+                fields=["account", "date"], name="account_man_account_045a65_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="regulartransactionmodel",
+            index=models.Index(
+                fields=["target_account", "billing_start", "billing_end"],
+                name="account_reg_target__337077_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="regulartransactionmodel",
+            index=models.Index(
+                fields=["counterparty_account", "billing_start", "billing_end"],
+                name="account_reg_counter_9ee89e_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import migrations
+
+from account.accounting.recurrence import Recurrence
+
+BATCH_SIZE = 5000
+
+
+def occurrence_dates(transaction, horizon: date) -> list[date]:
+    # Historical models have no methods, occurrences are expanded from fields
+    if hasattr(transaction, "period"):
+        return (
+            Recurrence(
+                period=transaction.period,
+                start=transaction.billing_start,
+                end=transaction.billing_end,
+            )
+            .occurrence_dates(date.min, horizon)
+            .tolist()
+        )
+    return [transaction.date]
+
+
+def build_occurrences(apps, schema_editor):
+    TransactionOccurrence = apps.get_model("account", "TransactionOccurrence")
+    BalanceCheckpoint = apps.get_model("account", "BalanceCheckpoint")
+    horizon = date.today() + timedelta(days=settings.ACCOUNT_OCCURRENCE_HORIZON_DAYS)
+
+    TransactionOccurrence.objects.all().delete()
+    BalanceCheckpoint.objects.all().delete()
+
+    for name in ["RegularTransactionModel", "ExtraTransactionModel"]:
+        batch = []
+        for transaction in apps.get_model("account", name).objects.iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            sides = [(transaction.target_account_id, transaction.amount)]
+            if transaction.counterparty_account_id is not None:
+                sides.append((transaction.counterparty_account_id, -transaction.amount))
+            batch.extend(
+                TransactionOccurrence(
+                    date=day,
+                    account_id=account_id,
+                    amount=amount,
+                    category_id=transaction.category_id,
+                    include_in_statistics=transaction.include_in_statistics,
+                    model=name.lower(),
+                    source_id=transaction.id,
+                )
+                for day in occurrence_dates(transaction, horizon)
+                for account_id, amount in sides
+            )
+            if len(batch) >= BATCH_SIZE:
+                TransactionOccurrence.objects.bulk_create(batch)
+                batch = []
+        TransactionOccurrence.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0014_range_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(build_occurrences, migrations.RunPython.noop),
+    ]
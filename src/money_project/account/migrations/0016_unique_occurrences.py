@@ -0,0 +1,63 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:39
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, Min, OuterRef
+
+
+def mark_counterparty_occurrences(apps, schema_editor):
+    TransactionOccurrence = apps.get_model("account", "TransactionOccurrence")
+    BalanceCheckpoint = apps.get_model("account", "BalanceCheckpoint")
+
+    # Counterparty sides are stored on the counterparty account with the
+    # negated amount
+    for name in ["RegularTransactionModel", "ExtraTransactionModel"]:
+        sources = apps.get_model("account", name).objects.filter(
+            id=OuterRef("source_id"),
+            counterparty_account_id=OuterRef("account_id"),
+            amount=OuterRef("amount") * -1,
+        )
+        TransactionOccurrence.objects.filter(
+            Exists(sources), model=name.lower()
+        ).update(counterparty=True)
+
+    # Occurrences extended by concurrent reads could be stored twice,
+    # checkpoints of their accounts counted them and are recomputed. Both
+    # sides of zero transfers within one account were marked, they are equal.
+    duplicates = (
+        TransactionOccurrence.objects.values(
+            "model", "source_id", "account", "date", "counterparty"
+        )
+        .annotate(first=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    accounts = set()
+    for duplicate in duplicates:
+        first = duplicate.pop("first")
+        duplicate.pop("count")
+        TransactionOccurrence.objects.filter(**duplicate).exclude(id=first).delete()
+        accounts.add(duplicate["account"])
+    BalanceCheckpoint.objects.filter(account__in=accounts).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0015_build_occurrences"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transactionoccurrence",
+            name="counterparty",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_counterparty_occurrences, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="transactionoccurrence",
+            constraint=models.UniqueConstraint(
+                fields=("model", "source_id", "account", "date", "counterparty"),
+                name="unique_transaction_occurrence",
+            ),
+        ),
+    ]
@@ -5,3 +5,5 @@ from .transaction import (
     ExtraTransactionModel,
     RegularTransactionModel,
 )
+from .occurrence import TransactionOccurrence
+from .checkpoint import BalanceCheckpoint
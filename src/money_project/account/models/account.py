@@ -37,6 +37,9 @@ class MoneyAccountModel(models.Model):
 
 
 class ManualAccountStateModel(models.Model):
+    class Meta:
+        indexes = [models.Index(fields=["account", "date"])]
+
     id = models.AutoField(primary_key=True)
     date = models.DateField()
     account = models.ForeignKey(MoneyAccountModel, on_delete=models.CASCADE)
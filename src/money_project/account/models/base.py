@@ -1,11 +1,15 @@
+import functools
 from decimal import Decimal
-from typing import Optional
+from typing import Iterable, Optional
 
+import numpy as np
 from django.db import models
 from mptt.models import MPTTModel, TreeForeignKey
 from simple_history import register
 from simple_history.models import HistoricalRecords
 
+from account.accounting.money import CurrencyFormatter
+
 
 class LedgerName(models.Model):
     id = models.AutoField(primary_key=True)
@@ -129,14 +133,12 @@ class CurrencyModel(models.Model):
     def __str__(self):
         return self.name
 
-    def format_currency(self, number: Decimal) -> str:
-        result = ""
-        if self.prefix:
-            result = self.prefix + result
-
-        result += "{:,.1f}".format(number).replace(",", " ").replace(".0", "")
+    @functools.cached_property
+    def formatter(self) -> CurrencyFormatter:
+        return CurrencyFormatter(self.prefix or "", self.suffix or "")
 
-        if self.suffix:
-            result = result + " " + self.suffix
+    def format_currency(self, number: Decimal) -> str:
+        return self.formatter(number)
 
-        return result
+    def format_currency_many(self, numbers: Iterable[Decimal]) -> np.ndarray:
+        return self.formatter.format_many(numbers)
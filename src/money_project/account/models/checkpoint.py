@@ -0,0 +1,142 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import models
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncMonth
+
+from account.accounting.cache import bump_versions
+
+from .account import MoneyAccountModel
+from .occurrence import TransactionOccurrence
+
+
+def end_of_month(day: date) -> date:
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+class BalanceCheckpointManager(models.Manager):
+
+    def invalidate(self, changes: dict[int, date]):
+        """
+        Drop checkpoints affected by occurrences changed on or after the given
+        date of every account, they are recomputed on the next read.
+        """
+        for account_id, first in changes.items():
+            self.filter(account_id=account_id, date__gte=first).delete()
+
+    def extend_occurrences(self, account_ids: Iterable[int], until: date):
+        """
+        Make sure stored occurrences of accounts are complete up to ``until``.
+
+        Checkpoints after the newly materialized occurrences are dropped.
+        """
+        changes = TransactionOccurrence.objects.extend(account_ids, until)
+        self.invalidate(changes)
+        bump_versions(changes)
+
+    def update_checkpoints(self, account_ids: Iterable[int], until: date):
+        """
+        Compute missing month end checkpoints of accounts up to ``until``.
+
+        Only months after the last stored checkpoint are summed, so after an
+        invalidation the work is proportional to the invalidated range.
+        """
+        self.extend_occurrences(account_ids, until)
+        last_checkpoints = dict(
+            self.filter(account_id__in=account_ids)
+            .values("account_id")
+            .annotate(last=Max("date"))
+            .values_list("account_id", "last")
+        )
+
+        for account_id in account_ids:
+            last = last_checkpoints.get(account_id)
+            if last is not None and last >= until:
+                continue
+
+            balance = (
+                self.get(account_id=account_id, date=last).balance
+                if last is not None
+                else Decimal(0)
+            )
+            occurrences = TransactionOccurrence.objects.filter(
+                account_id=account_id, date__lte=until
+            )
+            if last is not None:
+                occurrences = occurrences.filter(date__gt=last)
+
+            per_month = dict(
+                occurrences.annotate(month=TruncMonth("date"))
+                .values("month")
+                .annotate(amount=Sum("amount"))
+                .values_list("month", "amount")
+            )
+            if last is None and not per_month:
+                continue
+
+            checkpoints = []
+            month = (last + timedelta(days=1)) if last else min(per_month)
+            while end_of_month(month) <= until:
+                balance += per_month.get(month.replace(day=1), 0)
+                checkpoints.append(
+                    BalanceCheckpoint(
+                        account_id=account_id, date=end_of_month(month), balance=balance
+                    )
+                )
+                month = end_of_month(month) + timedelta(days=1)
+            self.bulk_create(checkpoints, ignore_conflicts=True)
+
+    def opening_balances(
+        self, accounts: list[MoneyAccountModel], day: date
+    ) -> dict[int, Decimal]:
+        """
+        Ideal balance of accounts at the beginning of ``day``.
+
+        Uses the last checkpoint before ``day`` and sums only the occurrences
+        of the remaining part of the month.
+        """
+        account_ids = [a.id for a in accounts]
+        checkpoint_date = day.replace(day=1) - timedelta(days=1)
+        self.extend_occurrences(account_ids, day - timedelta(days=1))
+        self.update_checkpoints(account_ids, checkpoint_date)
+
+        balances = {account_id: Decimal(0) for account_id in account_ids}
+        for account_id, balance in self.filter(
+            account_id__in=account_ids, date=checkpoint_date
+        ).values_list("account_id", "balance"):
+            balances[account_id] += balance
+
+        for row in TransactionOccurrence.objects.amounts_per_day(
+            account_ids, checkpoint_date + timedelta(days=1), day - timedelta(days=1)
+        ):
+            balances[row["account_id"]] += row["amount"]
+        return balances
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    Ideal balance of an account at the end of a month.
+
+    Derived from ``TransactionOccurrence``, checkpoints are computed lazily
+    and dropped from the first changed date whenever a transaction changes.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "date"], name="unique_balance_checkpoint"
+            )
+        ]
+
+    id = models.BigAutoField(primary_key=True)
+    account = models.ForeignKey(MoneyAccountModel, on_delete=models.CASCADE)
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+
+    objects = BalanceCheckpointManager()
+
+    def __str__(self):
+        return f"{self.date}: {self.account_id} = {self.balance}"
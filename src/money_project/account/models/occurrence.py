@@ -0,0 +1,223 @@
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Max, Q, Sum
+
+from .account import MoneyAccountModel
+from .base import CategoryModel
+from .transaction import (
+    BaseTransactionModel,
+    ExtraTransactionModel,
+    RegularTransactionModel,
+)
+
+
+def get_occurrence_horizon() -> date:
+    """
+    Last date materialized for regular transactions without a billing end.
+    """
+    return date.today() + timedelta(days=settings.ACCOUNT_OCCURRENCE_HORIZON_DAYS)
+
+
+def _first_dates(
+    occurrences: list["TransactionOccurrence"], changes: dict[int, date]
+) -> dict[int, date]:
+    for occurrence in occurrences:
+        first = changes.get(occurrence.account_id, occurrence.date)
+        changes[occurrence.account_id] = min(first, occurrence.date)
+    return changes
+
+
+class TransactionOccurrenceManager(models.Manager):
+
+    def for_source(self, model: str, source_id: int) -> models.QuerySet:
+        return self.filter(model=model, source_id=source_id)
+
+    def build_occurrences(
+        self,
+        transaction: BaseTransactionModel,
+        start_date: date = date.min,
+        end_date: Optional[date] = None,
+    ) -> list["TransactionOccurrence"]:
+        """
+        Build (unsaved) occurrences of a regular or extra transaction.
+
+        Transfers create an occurrence for both accounts, the counterparty
+        account gets the negated amount. Regular transactions without a billing
+        end are expanded up to the occurrence horizon unless ``end_date`` is
+        given.
+        """
+        model = type(transaction).objects.get_model_name()
+        if end_date is None:
+            end_date = date.max
+            if (
+                isinstance(transaction, RegularTransactionModel)
+                and transaction.billing_end is None
+            ):
+                end_date = get_occurrence_horizon()
+
+        sides = [(transaction.target_account_id, transaction.amount, False)]
+        if transaction.counterparty_account_id is not None:
+            sides.append(
+                (transaction.counterparty_account_id, -transaction.amount, True)
+            )
+
+        return [
+            TransactionOccurrence(
+                date=day,
+                account_id=account_id,
+                amount=amount,
+                category_id=transaction.category_id,
+                include_in_statistics=transaction.include_in_statistics,
+                model=model,
+                source_id=transaction.id,
+                counterparty=counterparty,
+            )
+            for day in transaction.get_occurrences(start_date, end_date).date
+            for account_id, amount, counterparty in sides
+        ]
+
+    def sync(self, transaction: BaseTransactionModel) -> dict[int, date]:
+        """
+        Replace stored occurrences of a transaction with freshly expanded ones.
+
+        Returns the earliest date whose occurrences changed (either removed or
+        created) for every affected account.
+        """
+        changes = self.remove(
+            type(transaction).objects.get_model_name(), transaction.id
+        )
+        occurrences = self.build_occurrences(transaction)
+        self.bulk_create(occurrences)
+        return _first_dates(occurrences, changes)
+
+    def extend(self, account_ids: Iterable[int], until: date) -> dict[int, date]:
+        """
+        Materialize occurrences of regular transactions without a billing end
+        of given accounts up to ``until``.
+
+        Their occurrences are stored only up to the horizon of the time they
+        were saved, schedules with an occurrence missing before ``until`` are
+        expanded past it up to the current horizon. Returns the earliest created
+        date for every affected account.
+        """
+        schedules = RegularTransactionModel.objects.filter(
+            Q(target_account_id__in=account_ids)
+            | Q(counterparty_account_id__in=account_ids),
+            billing_end__isnull=True,
+            billing_start__lte=until,
+        )
+        stored = dict(
+            self.filter(
+                model=RegularTransactionModel.objects.get_model_name(),
+                source_id__in=schedules.values("id"),
+            )
+            .values("source_id")
+            .annotate(last=Max("date"))
+            .values_list("source_id", "last")
+        )
+
+        end_date = max(until, get_occurrence_horizon())
+        occurrences = []
+        for schedule in schedules:
+            last = stored.get(schedule.id)
+            missing = (
+                schedule.recurrence.first_on_or_after(last + timedelta(days=1))
+                if last is not None
+                else schedule.billing_start
+            )
+            if missing is not None and missing <= until:
+                occurrences.extend(self.build_occurrences(schedule, missing, end_date))
+        # Another request may have stored the same occurrences meanwhile
+        self.bulk_create(occurrences, ignore_conflicts=True)
+        return _first_dates(occurrences, {})
+
+    def rebuild(self, batch_size: int) -> int:
+        """
+        Replace all stored occurrences with ones expanded from transactions.
+
+        Returns the number of created occurrences.
+        """
+        count = 0
+        self.all().delete()
+        for model in [RegularTransactionModel, ExtraTransactionModel]:
+            batch = []
+            for source in model.objects.iterator(chunk_size=batch_size):
+                batch.extend(self.build_occurrences(source))
+                if len(batch) >= batch_size:
+                    count += len(self.bulk_create(batch))
+                    batch = []
+            count += len(self.bulk_create(batch))
+        return count
+
+    def remove(self, model: str, source_id: int) -> dict[int, date]:
+        """
+        Remove stored occurrences of a transaction.
+
+        Returns the earliest removed date for every affected account.
+        """
+        occurrences = self.for_source(model, source_id)
+        changes = dict(
+            occurrences.values("account_id")
+            .annotate(first=models.Min("date"))
+            .values_list("account_id", "first")
+        )
+        occurrences.delete()
+        return changes
+
+    def amounts_per_day(
+        self, accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    ) -> models.QuerySet:
+        """
+        Sum of occurrence amounts per account and day, computed by the database.
+        """
+        return (
+            self.filter(account__in=accounts, date__gte=start_date, date__lte=end_date)
+            .values("account_id", "date")
+            .annotate(amount=Sum("amount"))
+            .order_by("account_id", "date")
+        )
+
+
+class TransactionOccurrence(models.Model):
+    """
+    One realized occurrence of a transaction on one account.
+
+    Derived data kept up to date by signals in ``account.signals``, rebuild
+    it with the ``rebuild_occurrences`` command after bulk changes.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "date"]),
+            models.Index(fields=["model", "source_id"]),
+        ]
+        constraints = [
+            # Concurrent reads may extend the same occurrences, each one is
+            # stored only once
+            models.UniqueConstraint(
+                fields=["model", "source_id", "account", "date", "counterparty"],
+                name="unique_transaction_occurrence",
+            )
+        ]
+
+    id = models.BigAutoField(primary_key=True)
+    date = models.DateField()
+    account = models.ForeignKey(MoneyAccountModel, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.ForeignKey(
+        CategoryModel, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    include_in_statistics = models.BooleanField(default=True)
+
+    model = models.CharField(max_length=50)
+    source_id = models.IntegerField()
+    # Transfers within one account have both sides on the same day
+    counterparty = models.BooleanField(default=False)
+
+    objects = TransactionOccurrenceManager()
+
+    def __str__(self):
+        return f"{self.date}: {self.account_id} {self.amount} ({self.model}-{self.source_id})"
@@ -1,34 +1,112 @@
 import abc
-from datetime import date
-from typing import Iterator, Optional
+from datetime import date, timedelta
+from typing import Iterable, Iterator, Optional
 
+import numpy as np
 import pandas as pd
 from django.db import models
 from django.db.models import Q
 from django.utils.formats import date_format
 from django.utils.translation import gettext_lazy as _
-from pandas.tseries.offsets import BaseOffset, BDay, DateOffset
 from simple_history.models import HistoricalRecords
 
+from account.accounting.money import to_cents
+from account.accounting.recurrence import Recurrence
 from account.models import CategoryModel, TagModel
 from account.models.account import MoneyAccountModel
 from account.models.base import CurrencyModel, LedgerName
 
 
+def build_tag_lineages() -> dict[int, tuple[list[str], list[int]]]:
+    """
+    Map every tag id to the names and ids of the tag and all of its parents.
+
+    Same result as ``TagModel.get_all_names`` and ``TagModel.get_all_ids``,
+    but resolved from a single query instead of one query per parent.
+    """
+    tags = {
+        tag_id: (name, parent_id)
+        for tag_id, name, parent_id in TagModel.objects.values_list(
+            "id", "name", "parent_id"
+        )
+    }
+
+    lineages = {}
+    for tag_id in tags:
+        names, ids = [], []
+        current = tag_id
+        while current is not None:
+            name, parent_id = tags[current]
+            names.append(name)
+            ids.append(current)
+            current = parent_id
+        lineages[tag_id] = (names, ids)
+
+    return lineages
+
+
+# Columns of the transaction frame stored as categorical
+CATEGORICAL_COLUMNS = ["category", "account", "counter_party_account", "model"]
+
+
+def _object_array(values: list) -> np.ndarray:
+    result = np.empty(len(values), dtype=object)
+    result[:] = values
+    return result
+
+
 class BaseTransactionManager(models.Manager):
+    # Fields fetched for every transaction when building the frame
+    frame_fields = [
+        "id",
+        "name",
+        "amount",
+        "include_in_statistics",
+        "category_id",
+        "category__name",
+        "target_account_id",
+        "target_account__name",
+        "counterparty_account_id",
+        "counterparty_account__name",
+    ]
 
     @staticmethod
     def build_dataframe_all(
         accounts: list[MoneyAccountModel], start_date: date, end_date: date
     ) -> pd.DataFrame:
-        df_regular = RegularTransactionModel.objects.build_dataframe(
+        return BaseTransactionManager.columns_to_dataframe(
+            BaseTransactionManager.build_columns_all(accounts, start_date, end_date)
+        )
+
+    @staticmethod
+    def build_columns_all(
+        accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    ) -> dict[str, np.ndarray]:
+        accounts = list(accounts)
+        columns_regular = RegularTransactionModel.objects.build_columns(
             accounts, start_date, end_date
         )
-        df_extra = ExtraTransactionModel.objects.build_dataframe(
+        columns_extra = ExtraTransactionModel.objects.build_columns(
             accounts, start_date, end_date
         )
 
-        return pd.concat([df_regular, df_extra], ignore_index=True)
+        return {
+            name: np.concatenate([values, columns_extra[name]])
+            for name, values in columns_regular.items()
+        }
+
+    @staticmethod
+    def columns_to_dataframe(columns: dict[str, np.ndarray]) -> pd.DataFrame:
+        df = pd.DataFrame(
+            {
+                name: values.astype(object) if name == "date" else values
+                for name, values in columns.items()
+                if name != "mirrored"
+            }
+        )
+        for name in CATEGORICAL_COLUMNS:
+            df[name] = df[name].astype("category")
+        return df
 
     def all_for_accounts(self, accounts: list[MoneyAccountModel]) -> models.QuerySet:
         """
@@ -50,76 +128,136 @@ class BaseTransactionManager(models.Manager):
     ) -> models.QuerySet:
         raise NotImplementedError
 
+    def expand_occurrences(
+        self, transactions: list[dict], start_date: date, end_date: date
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Expand transactions fetched with ``frame_fields`` into occurrences.
+
+        Returns position of the source transaction and ``datetime64[D]`` date
+        for every occurrence.
+        """
+        raise NotImplementedError
+
+    def get_tag_ids(self, transactions: models.QuerySet) -> dict[int, list[int]]:
+        """
+        Map ids of given transactions to ids of their tags using a single query.
+        """
+        field = self.model._meta.get_field("tag")
+        transaction_field = f"{field.m2m_field_name()}_id"
+        tag_field = f"{field.m2m_reverse_field_name()}_id"
+
+        result = {}
+        for transaction_id, tag_id in field.remote_field.through.objects.filter(
+            **{f"{transaction_field}__in": transactions.values("id")}
+        ).values_list(transaction_field, tag_field):
+            result.setdefault(transaction_id, []).append(tag_id)
+        return result
+
+    def build_columns(
+        self, accounts: list[MoneyAccountModel], start_date: date, end_date: date
+    ) -> dict[str, np.ndarray]:
+        """
+        Build columns of the transaction frame with one row per occurrence.
+
+        Amounts are kept both as ``Decimal`` and as exact ``int64`` cents used
+        for aggregations. Transfers to another of given accounts get a mirrored
+        row with negated amount and swapped accounts, placed right after the
+        original row. The extra ``mirrored`` column marks these rows, it is not
+        part of the frame.
+        """
+        account_ids = [account.id for account in accounts]
+        queryset = self.all_for_account_in_range(accounts, start_date, end_date)
+        transactions = list(queryset.values(*self.frame_fields))
+
+        # Lineages are in tree order of the tag manager, same as `tag.all()`
+        tag_lineages = build_tag_lineages()
+        tag_order = {tag_id: i for i, tag_id in enumerate(tag_lineages)}
+        tag_ids = self.get_tag_ids(queryset)
+        transaction_tags = [
+            [
+                tag_lineages[tag_id]
+                for tag_id in sorted(tag_ids.get(t["id"], []), key=tag_order.get)
+            ]
+            for t in transactions
+        ]
+
+        def column(field: str, dtype=object) -> np.ndarray:
+            values = [t[field] for t in transactions]
+            if dtype is object:
+                return _object_array(values)
+            return np.array(values, dtype=dtype)
+
+        positions, dates = self.expand_occurrences(transactions, start_date, end_date)
+
+        model_name = self.get_model_name()
+        row = {
+            "id": _object_array([self.get_id(t["id"]) for t in transactions]),
+            "raw_id": column("id", "int64"),
+            "date": dates,
+            "name": column("name"),
+            "amount": column("amount"),
+            "amount_cents": to_cents(t["amount"] for t in transactions),
+            "include_in_statistics": column("include_in_statistics", "bool"),
+            "tags": _object_array(
+                [
+                    [name for names, _ in tags for name in names]
+                    for tags in transaction_tags
+                ]
+            ),
+            "category": column("category__name"),
+            "account": column("target_account__name"),
+            "counter_party_account": column("counterparty_account__name"),
+            "tag_ids": _object_array(
+                [[id for _, ids in tags for id in ids] for tags in transaction_tags]
+            ),
+            "category_id": column("category_id", "float64"),
+            "account_id": column("target_account_id", "int64"),
+            "counter_party_account_id": column("counterparty_account_id", "float64"),
+            "model": _object_array([model_name] * len(transactions)),
+        }
+        result = {
+            name: values if name == "date" else values[positions]
+            for name, values in row.items()
+        }
+
+        mirror = np.isin(result["counter_party_account_id"], account_ids)
+        mirrored = {name: values[mirror] for name, values in result.items()}
+        result["mirrored"] = np.zeros(len(mirror), dtype="bool")
+        mirrored.update(
+            {
+                "mirrored": np.ones(mirror.sum(), dtype="bool"),
+                "amount": -mirrored["amount"],
+                "amount_cents": -mirrored["amount_cents"],
+                "account": mirrored["counter_party_account"],
+                "counter_party_account": mirrored["account"],
+                "account_id": mirrored["counter_party_account_id"].astype("int64"),
+                "counter_party_account_id": mirrored["account_id"].astype("float64"),
+            }
+        )
+
+        # Keep mirrored rows next to the row they were created from
+        order = np.argsort(
+            np.concatenate(
+                [np.arange(len(mirror)) * 2, np.flatnonzero(mirror) * 2 + 1]
+            ),
+            kind="stable",
+        )
+        return {
+            name: np.concatenate([values, mirrored[name]])[order]
+            for name, values in result.items()
+        }
+
     def build_dataframe(
         self, accounts: list[MoneyAccountModel], start_date: date, end_date: date
     ) -> pd.DataFrame:
-        transactions = self.all_for_account_in_range(accounts, start_date, end_date)
-
-        result = []
-
-        transaction: BaseTransactionModel
-        for transaction in transactions:
-            for d in transaction.create_date_generator():
-                if d > end_date:
-                    break
-
-                if d >= start_date:
-                    transaction_tags = transaction.tag.all()
-                    tags = [
-                        name for tag in transaction_tags for name in tag.get_all_names()
-                    ]
-
-                    tag_ids = [
-                        ids for tag in transaction_tags for ids in tag.get_all_ids()
-                    ]
-
-                    counter_party_account = transaction.counterparty_account
-                    category = transaction.category
-
-                    data = {
-                        "id": self.get_id(transaction.id),
-                        "raw_id": transaction.id,
-                        # Transaction details
-                        "date": d,
-                        "name": transaction.name,
-                        "amount": transaction.amount,
-                        "include_in_statistics": transaction.include_in_statistics,
-                        # Grouping info
-                        "tags": tags,
-                        "category": category.name if category else None,
-                        # Account info
-                        "account": transaction.target_account.name,
-                        "counter_party_account": (
-                            counter_party_account.name
-                            if counter_party_account
-                            else None
-                        ),
-                        # Debug info
-                        "tag_ids": tag_ids,
-                        "category_id": category.id if category else None,
-                        "account_id": transaction.target_account.id,
-                        "counter_party_account_id": (
-                            counter_party_account.id if counter_party_account else None
-                        ),
-                        "model": transaction.__class__.__name__.lower(),
-                    }
-                    result.append(data)
-
-                    if counter_party_account and counter_party_account in accounts:
-                        counter_data = {
-                            **data,
-                            "amount": -data["amount"],
-                            "account": data["counter_party_account"],
-                            "counter_party_account": data["account"],
-                            "account_id": data["counter_party_account_id"],
-                            "counter_party_account_id": data["account_id"],
-                        }
-                        result.append(counter_data)
-
-        return pd.DataFrame(result)
+        return self.columns_to_dataframe(
+            self.build_columns(list(accounts), start_date, end_date)
+        )
 
 
 class ExtraTransactionManager(BaseTransactionManager):
+    frame_fields = BaseTransactionManager.frame_fields + ["date"]
 
     def all_for_account_in_range(
         self, accounts: list[MoneyAccountModel], start_date: date, end_date: date
@@ -128,15 +266,42 @@ class ExtraTransactionManager(BaseTransactionManager):
             Q(date__gte=start_date) & Q(date__lte=end_date)
         )
 
+    def expand_occurrences(
+        self, transactions: list[dict], start_date: date, end_date: date
+    ) -> tuple[np.ndarray, np.ndarray]:
+        dates = np.array([t["date"] for t in transactions], dtype="datetime64[D]")
+        return np.arange(len(transactions)), dates
+
 
 class RegularTransactionManager(BaseTransactionManager):
+    frame_fields = BaseTransactionManager.frame_fields + [
+        "period",
+        "billing_start",
+        "billing_end",
+    ]
 
     def all_for_account_in_range(
         self, accounts: list[MoneyAccountModel], start_date: date, end_date: date
     ) -> models.QuerySet:
+        # Schedules started before the end of the range and not ended before it
         return self.all_for_accounts(accounts).filter(
-            (Q(billing_start__lte=start_date) & Q(billing_end__gte=start_date))
-            | (Q(billing_start__lte=end_date))
+            Q(billing_start__lte=end_date)
+            & (Q(billing_end__isnull=True) | Q(billing_end__gte=start_date))
+        )
+
+    def expand_occurrences(
+        self, transactions: list[dict], start_date: date, end_date: date
+    ) -> tuple[np.ndarray, np.ndarray]:
+        occurrences = [
+            Recurrence(
+                period=t["period"], start=t["billing_start"], end=t["billing_end"]
+            ).occurrence_dates(start_date, end_date)
+            for t in transactions
+        ]
+        counts = [len(dates) for dates in occurrences]
+        return (
+            np.repeat(np.arange(len(transactions)), counts),
+            np.concatenate([np.empty(0, dtype="datetime64[D]"), *occurrences]),
         )
 
 
@@ -185,6 +350,10 @@ class BaseTransactionModel(models.Model):
     def create_date_generator(self) -> Iterator[date]:
         pass
 
+    @abc.abstractmethod
+    def get_occurrences(self, start_date: date, end_date: date) -> pd.DatetimeIndex:
+        pass
+
     @abc.abstractmethod
     def next_billing(self, relative_to: Optional[date] = None) -> Optional[date]:
         pass
@@ -197,6 +366,18 @@ class BaseTransactionModel(models.Model):
     def is_billing_date(self, day: date) -> bool:
         pass
 
+    @abc.abstractmethod
+    def next_billing_many(self, days: Iterable[date]) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def previous_billing_many(self, days: Iterable[date]) -> np.ndarray:
+        pass
+
+    def is_billing_date_many(self, days: Iterable[date]) -> np.ndarray:
+        days = np.asarray(days, dtype="datetime64[D]")
+        return self.next_billing_many(days) == days
+
     @abc.abstractmethod
     def __str__(self):
         pass
@@ -219,6 +400,13 @@ class BaseTransactionModel(models.Model):
 
 
 class ExtraTransactionModel(BaseTransactionModel):
+    class Meta:
+        # Range lookups of `all_for_account_in_range` for both sides
+        indexes = [
+            models.Index(fields=["target_account", "date"]),
+            models.Index(fields=["counterparty_account", "date"]),
+        ]
+
     date = models.DateField()
     history = HistoricalRecords()
 
@@ -227,6 +415,11 @@ class ExtraTransactionModel(BaseTransactionModel):
     def create_date_generator(self) -> Iterator[date]:
         yield self.date
 
+    def get_occurrences(self, start_date: date, end_date: date) -> pd.DatetimeIndex:
+        if start_date <= self.date <= end_date:
+            return pd.DatetimeIndex([self.date])
+        return pd.DatetimeIndex([])
+
     def next_billing(self, relative_to: Optional[date] = None) -> Optional[date]:
         relative_to = relative_to or date.today()
         if relative_to <= self.date:
@@ -242,6 +435,16 @@ class ExtraTransactionModel(BaseTransactionModel):
     def is_billing_date(self, day: date) -> bool:
         return day == self.date
 
+    def next_billing_many(self, days: Iterable[date]) -> np.ndarray:
+        days = np.asarray(days, dtype="datetime64[D]")
+        billing = np.datetime64(self.date, "D")
+        return np.where(days <= billing, billing, np.datetime64("NaT", "D"))
+
+    def previous_billing_many(self, days: Iterable[date]) -> np.ndarray:
+        days = np.asarray(days, dtype="datetime64[D]")
+        billing = np.datetime64(self.date, "D")
+        return np.where(days > billing, billing, np.datetime64("NaT", "D"))
+
     def __str__(self):
         return "{}: {} {}".format(
             date_format(self.date),
@@ -260,6 +463,15 @@ class RegularTransactionModel(BaseTransactionModel):
         Daily = "Daily", _("Daily")
         WorkDay = "Work-Day", _("Work-Day")
 
+    class Meta:
+        # Range lookups of `all_for_account_in_range` for both sides
+        indexes = [
+            models.Index(fields=["target_account", "billing_start", "billing_end"]),
+            models.Index(
+                fields=["counterparty_account", "billing_start", "billing_end"]
+            ),
+        ]
+
     period = models.CharField(max_length=15, choices=Period.choices)
     billing_start = models.DateField()
     billing_end = models.DateField(null=True, blank=True)
@@ -268,65 +480,39 @@ class RegularTransactionModel(BaseTransactionModel):
 
     objects = RegularTransactionManager()
 
-    def _period_to_timedelta(self) -> BaseOffset:
-        match self.period:
-            case "Yearly":
-                return DateOffset(years=1)
-            case "Quarterly":
-                return DateOffset(months=3)
-            case "Half-Yearly":
-                return DateOffset(months=6)
-            case "Monthly":
-                return DateOffset(months=1)
-            case "Weekly":
-                return DateOffset(weeks=1)
-            case "Daily":
-                return DateOffset(days=1)
-            case "Work-Day":
-                return BDay(1)
+    @property
+    def recurrence(self) -> Recurrence:
+        return Recurrence(
+            period=str(self.period), start=self.billing_start, end=self.billing_end
+        )
 
     def create_date_generator(self) -> Iterator[date]:
-        yield self.billing_start
+        recurrence = self.recurrence
+        day = recurrence.first_on_or_after(self.billing_start)
+        while day is not None:
+            yield day
+            day = recurrence.first_on_or_after(day + timedelta(days=1))
 
-        new_date = self.billing_start + self._period_to_timedelta()
-        while self.billing_end is None or new_date.date() <= self.billing_end:
-            yield new_date.date()
-            new_date += self._period_to_timedelta()
+    def get_occurrences(self, start_date: date, end_date: date) -> pd.DatetimeIndex:
+        return self.recurrence.occurrences(start_date, end_date)
 
     def next_billing(self, relative_to: Optional[date] = None) -> Optional[date]:
         relative_to = relative_to or date.today()
-
-        # TODO this is really inefficient implementation but hey it works
-        date_generator = self.create_date_generator()
-        for d in date_generator:
-            if d >= relative_to:
-                return d
-
-        return None
+        return self.recurrence.first_on_or_after(relative_to)
 
     def previous_billing(self, relative_to: Optional[date] = None) -> Optional[date]:
         relative_to = relative_to or date.today()
-
-        # TODO this is really inefficient implementation but hey it works
-        date_generator = self.create_date_generator()
-        try:
-            previous_date = next(date_generator)
-        except StopIteration:
-            return None
-
-        if previous_date < relative_to:
-            return previous_date
-
-        for d in date_generator:
-            if d >= relative_to:
-                return previous_date
-            previous_date = d
-
-        return None
+        return self.recurrence.last_before(relative_to)
 
     def is_billing_date(self, day: date) -> bool:
         return self.next_billing(day) == day
 
+    def next_billing_many(self, days: Iterable[date]) -> np.ndarray:
+        return self.recurrence.first_on_or_after_many(days)
+
+    def previous_billing_many(self, days: Iterable[date]) -> np.ndarray:
+        return self.recurrence.last_before_many(days)
+
     def __str__(self):
         start = (
             date_format(self.billing_start)
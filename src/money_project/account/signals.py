@@ -0,0 +1,108 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .accounting.cache import bump_global_version, bump_versions
+from .models import (
+    CategoryModel,
+    CurrencyModel,
+    ExtraTransactionModel,
+    LedgerName,
+    ManualAccountStateModel,
+    MoneyAccountModel,
+    RegularTransactionModel,
+    TagModel,
+)
+from .models.checkpoint import BalanceCheckpoint
+from .models.occurrence import TransactionOccurrence
+
+
+def _transaction_accounts(transaction) -> list[int]:
+    return [
+        account_id
+        for account_id in [
+            transaction.target_account_id,
+            transaction.counterparty_account_id,
+        ]
+        if account_id is not None
+    ]
+
+
+@receiver(post_save, sender=RegularTransactionModel)
+@receiver(post_save, sender=ExtraTransactionModel)
+def sync_transaction_occurrences(sender, instance, raw=False, **kwargs):
+    # Loading fixtures, related objects may not exist yet
+    if raw:
+        return
+
+    changes = TransactionOccurrence.objects.sync(instance)
+    BalanceCheckpoint.objects.invalidate(changes)
+    # Occurrences removed from previous accounts are part of the changes
+    bump_versions([*changes, *_transaction_accounts(instance)])
+
+
+@receiver(post_delete, sender=RegularTransactionModel)
+@receiver(post_delete, sender=ExtraTransactionModel)
+def remove_transaction_occurrences(sender, instance, **kwargs):
+    changes = TransactionOccurrence.objects.remove(
+        sender.objects.get_model_name(), instance.id
+    )
+    BalanceCheckpoint.objects.invalidate(changes)
+    bump_versions([*changes, *_transaction_accounts(instance)])
+
+
+@receiver(m2m_changed, sender=RegularTransactionModel.tag.through)
+@receiver(m2m_changed, sender=ExtraTransactionModel.tag.through)
+def transaction_tags_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    if reverse:
+        # Transactions were added to or removed from a tag
+        bump_global_version()
+    else:
+        bump_versions(_transaction_accounts(instance))
+
+
+@receiver(m2m_changed, sender=MoneyAccountModel.tags.through)
+def account_tags_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    # Tags are shown on cards of accounts
+    if reverse:
+        bump_global_version()
+    else:
+        bump_versions([instance.id])
+
+
+@receiver(pre_save, sender=ManualAccountStateModel)
+def manual_state_moved(sender, instance, raw=False, **kwargs):
+    # The state may be moved to another account, invalidate the previous one
+    if instance.pk is not None and not raw:
+        bump_versions(
+            ManualAccountStateModel.objects.filter(pk=instance.pk).values_list(
+                "account_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=ManualAccountStateModel)
+@receiver(post_delete, sender=ManualAccountStateModel)
+def manual_state_changed(sender, instance, **kwargs):
+    bump_versions([instance.account_id])
+
+
+# Names of these, and currencies formatting amounts, are part of results of
+# every account
+@receiver(post_save, sender=MoneyAccountModel)
+@receiver(post_delete, sender=MoneyAccountModel)
+@receiver(post_save, sender=TagModel)
+@receiver(post_delete, sender=TagModel)
+@receiver(post_save, sender=CategoryModel)
+@receiver(post_delete, sender=CategoryModel)
+@receiver(post_save, sender=LedgerName)
+@receiver(post_delete, sender=LedgerName)
+@receiver(post_save, sender=CurrencyModel)
+@receiver(post_delete, sender=CurrencyModel)
+def shared_data_changed(sender, **kwargs):
+    bump_global_version()
@@ -1,3 +1,1216 @@
-from django.test import TestCase
+import base64
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import QuerySet
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from account.accounting.balance import (
+    downsample_balance,
+    get_ideal_account_balance,
+    get_real_account_balance,
+)
+from account.accounting.cache import GLOBAL_VERSION, get_versions
+from account.accounting.context import AccountingContext
+from account.accounting.expence import (
+    get_expenses_per_category,
+    get_expenses_per_category_per_month,
+    get_expenses_per_tag,
+    get_expenses_per_tag_per_month,
+)
+from account.accounting.money import from_cents, to_cents
+from account.accounting.recurrence import Recurrence
+from account.management.commands import ledger
+from account.management.commands.ledger.base import (
+    AmountTransfer,
+    Posting,
+    RegularTransactionLedger,
+    TransactionLedger,
+)
+from account.models import (
+    BalanceCheckpoint,
+    CategoryModel,
+    CurrencyModel,
+    ExtraTransactionModel,
+    ManualAccountStateModel,
+    MoneyAccountModel,
+    RegularTransactionModel,
+    TagModel,
+    TransactionOccurrence,
+)
+from account.models.transaction import BaseTransactionManager
+from account.views import panels
+
+# Tests must not read or clear the cache shared by the running server
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class AccountTestMixin:
+    def setUp(self):
+        caches = override_settings(CACHES=TEST_CACHES)
+        caches.enable()
+        self.addCleanup(caches.disable)
+        # Cached results would outlive the test database
+        cache.clear()
+
+        self.owner = User.objects.create(username="owner")
+        self.currency = CurrencyModel.objects.create(name="CZK", suffix="Kč")
+        self.account = MoneyAccountModel.objects.create(
+            name="Checking", currency=self.currency, owner=self.owner
+        )
+        self.savings = MoneyAccountModel.objects.create(
+            name="Savings", currency=self.currency, owner=self.owner
+        )
+
+        self.category = CategoryModel.objects.create(
+            name="Food", parent=CategoryModel.objects.create(name="Living")
+        )
+        self.tag = TagModel.objects.create(
+            name="Groceries", parent=TagModel.objects.create(name="Shopping")
+        )
+
+    def create_regular(self, **kwargs) -> RegularTransactionModel:
+        data = {
+            "name": "Regular",
+            "amount": Decimal("-100"),
+            "period": RegularTransactionModel.Period.Monthly,
+            "billing_start": date(2024, 1, 1),
+            "target_account": self.account,
+            **kwargs,
+        }
+        return RegularTransactionModel.objects.create(**data)
+
+    def create_extra(self, **kwargs) -> ExtraTransactionModel:
+        data = {
+            "name": "Extra",
+            "amount": Decimal("-10"),
+            "date": date(2024, 1, 15),
+            "target_account": self.account,
+            **kwargs,
+        }
+        return ExtraTransactionModel.objects.create(**data)
+
+
+class AccountTestCase(AccountTestMixin, TestCase):
+    pass
+
+
+class BuildDataframeTest(AccountTestCase):
+    def count_queries(self, start_date: date, end_date: date) -> int:
+        accounts = MoneyAccountModel.objects.all()
+        with CaptureQueriesContext(connection) as queries:
+            BaseTransactionManager.build_dataframe_all(accounts, start_date, end_date)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_data(self):
+        self.create_regular()
+        self.create_extra()
+        baseline = self.count_queries(date(2024, 1, 1), date(2024, 1, 31))
+
+        for i in range(10):
+            regular = self.create_regular(
+                period=RegularTransactionModel.Period.Daily,
+                category=self.category,
+                counterparty_account=self.savings,
+            )
+            regular.tag.add(self.tag)
+
+            extra = self.create_extra(
+                date=date(2024, 1 + i, 10),
+                category=self.category,
+                counterparty_account=self.savings,
+            )
+            extra.tag.add(self.tag, self.tag.parent)
+
+        self.assertEqual(
+            self.count_queries(date(2024, 1, 1), date(2025, 12, 31)), baseline
+        )
+
+    def test_tags_include_parents(self):
+        regular = self.create_regular(counterparty_account=self.savings)
+        regular.tag.add(self.tag)
+
+        df = BaseTransactionManager.build_dataframe_all(
+            MoneyAccountModel.objects.all(), date(2024, 1, 1), date(2024, 1, 31)
+        )
+
+        self.assertEqual(len(df), 2)
+        self.assertEqual(df.tags.iloc[0], ["Groceries", "Shopping"])
+        self.assertEqual(df.tag_ids.iloc[0], [self.tag.id, self.tag.parent.id])
+        self.assertEqual(sorted(df.amount), [Decimal("-100"), Decimal("100")])
+
+
+class RegularRangeTest(AccountTestCase):
+    def test_ended_schedules_are_excluded(self):
+        expected = [
+            self.create_regular(billing_end=None),
+            self.create_regular(billing_end=date(2024, 3, 1)),
+            self.create_regular(billing_end=date(2024, 6, 1)),
+            self.create_regular(
+                billing_start=date(2024, 6, 30), counterparty_account=self.account
+            ),
+        ]
+        self.create_regular(billing_end=date(2024, 2, 29))
+        self.create_regular(billing_start=date(2024, 7, 1))
+
+        queryset = RegularTransactionModel.objects.all_for_account_in_range(
+            [self.account], date(2024, 3, 1), date(2024, 6, 30)
+        )
+        self.assertEqual(set(queryset), set(expected))
+
+    def test_same_occurrences(self):
+        for i in range(12):
+            self.create_regular(
+                period=RegularTransactionModel.Period.Weekly,
+                billing_start=date(2023, i + 1, 1),
+                billing_end=date(2024, i + 1, 1),
+            )
+
+        accounts = [self.account]
+        df = RegularTransactionModel.objects.build_dataframe(
+            accounts, date(2024, 3, 1), date(2024, 6, 30)
+        )
+        expected = [
+            (t.id, day)
+            for t in RegularTransactionModel.objects.all()
+            for day in t.get_occurrences(date(2024, 3, 1), date(2024, 6, 30)).date
+        ]
+        self.assertEqual(sorted(zip(df.raw_id, df.date)), sorted(expected))
+
+
+class RecurrenceTest(TestCase):
+    def test_month_end_does_not_drift(self):
+        recurrence = Recurrence("Monthly", date(2024, 1, 31))
+        self.assertEqual(
+            list(recurrence.occurrences(date(2024, 1, 1), date(2024, 4, 30)).date),
+            [
+                date(2024, 1, 31),
+                date(2024, 2, 29),
+                date(2024, 3, 31),
+                date(2024, 4, 30),
+            ],
+        )
+
+    def test_window_long_after_start(self):
+        recurrence = Recurrence("Weekly", date(2014, 1, 6), end=date(2024, 1, 20))
+        self.assertEqual(
+            list(recurrence.occurrences(date(2024, 1, 1), date(2024, 12, 31)).date),
+            [date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15)],
+        )
+
+    def test_work_day(self):
+        recurrence = Recurrence("Work-Day", date(2024, 1, 6))
+        self.assertEqual(
+            list(recurrence.occurrences(date(2024, 1, 1), date(2024, 1, 10)).date),
+            [date(2024, 1, 6), date(2024, 1, 8), date(2024, 1, 9), date(2024, 1, 10)],
+        )
+        self.assertEqual(
+            recurrence.first_on_or_after(date(2024, 1, 13)), date(2024, 1, 15)
+        )
+
+    def test_first_on_or_after(self):
+        recurrence = Recurrence("Quarterly", date(2020, 5, 31), end=date(2024, 12, 31))
+        self.assertEqual(
+            recurrence.first_on_or_after(date(2010, 1, 1)), date(2020, 5, 31)
+        )
+        self.assertEqual(
+            recurrence.first_on_or_after(date(2024, 3, 1)), date(2024, 5, 31)
+        )
+        self.assertEqual(
+            recurrence.first_on_or_after(date(2024, 9, 1)), date(2024, 11, 30)
+        )
+        self.assertIsNone(recurrence.first_on_or_after(date(2024, 12, 1)))
+
+
+class BillingTest(AccountTestCase):
+    def test_regular_billing(self):
+        regular = self.create_regular(
+            billing_start=date(2014, 1, 15), billing_end=date(2024, 6, 30)
+        )
+
+        self.assertEqual(regular.next_billing(date(2024, 3, 16)), date(2024, 4, 15))
+        self.assertEqual(regular.previous_billing(date(2024, 3, 16)), date(2024, 3, 15))
+        self.assertEqual(regular.previous_billing(date(2030, 1, 1)), date(2024, 6, 15))
+        self.assertIsNone(regular.next_billing(date(2024, 6, 16)))
+        self.assertIsNone(regular.previous_billing(date(2014, 1, 15)))
+        self.assertTrue(regular.is_billing_date(date(2020, 2, 15)))
+        self.assertFalse(regular.is_billing_date(date(2020, 2, 16)))
+
+    def test_billing_many(self):
+        regular = self.create_regular(period=RegularTransactionModel.Period.Weekly)
+        extra = self.create_extra()
+        days = [date(2023, 12, 1), date(2024, 1, 8), date(2024, 1, 10)]
+
+        for transaction in [regular, extra]:
+            self.assertEqual(
+                transaction.next_billing_many(days).tolist(),
+                [transaction.next_billing(day) for day in days],
+            )
+            self.assertEqual(
+                transaction.previous_billing_many(days).tolist(),
+                [transaction.previous_billing(day) for day in days],
+            )
+            self.assertEqual(
+                transaction.is_billing_date_many(days).tolist(),
+                [transaction.is_billing_date(day) for day in days],
+            )
+
+
+class AccountingContextTest(AccountTestCase):
+    def test_slice_matches_build(self):
+        other = MoneyAccountModel.objects.create(
+            name="Other", currency=self.currency, owner=self.owner
+        )
+        self.create_regular(counterparty_account=self.savings)
+        self.create_regular(target_account=other, counterparty_account=self.account)
+        self.create_extra(target_account=self.savings)
+
+        accounts = MoneyAccountModel.objects.all()
+        accounting = AccountingContext(accounts, date(2024, 1, 1), date(2024, 12, 31))
+
+        for subset in [accounts, [self.account], [self.savings, other]]:
+            expected = BaseTransactionManager.build_dataframe_all(
+                subset, date(2024, 3, 1), date(2024, 5, 31)
+            )
+            result = accounting.get_transactions(
+                subset, date(2024, 3, 1), date(2024, 5, 31)
+            )
+            columns = ["id", "date", "account_id"]
+            pd.testing.assert_frame_equal(
+                result.sort_values(columns).reset_index(drop=True),
+                expected.sort_values(columns).reset_index(drop=True),
+                check_categorical=False,
+            )
+
+    def test_outside_of_context(self):
+        accounting = AccountingContext(
+            [self.account], date(2024, 1, 1), date(2024, 12, 31)
+        )
+        with self.assertRaises(ValueError):
+            accounting.get_transactions(
+                [self.account], date(2023, 12, 31), date(2024, 1, 31)
+            )
+        with self.assertRaises(ValueError):
+            accounting.get_transactions(
+                [self.savings], date(2024, 1, 1), date(2024, 1, 31)
+            )
+
+
+class TransactionOccurrenceTest(AccountTestCase):
+    def test_kept_in_sync(self):
+        regular = self.create_regular(
+            billing_end=date(2024, 3, 31), counterparty_account=self.savings
+        )
+        occurrences = TransactionOccurrence.objects.for_source(
+            "regulartransactionmodel", regular.id
+        )
+        self.assertEqual(occurrences.count(), 6)
+        self.assertEqual(
+            list(
+                occurrences.filter(account=self.savings)
+                .order_by("date")
+                .values_list("date", "amount")
+            ),
+            [
+                (date(2024, 1, 1), Decimal("100")),
+                (date(2024, 2, 1), Decimal("100")),
+                (date(2024, 3, 1), Decimal("100")),
+            ],
+        )
+
+        regular.billing_end = date(2024, 1, 31)
+        regular.counterparty_account = None
+        regular.save()
+        self.assertEqual(occurrences.count(), 1)
+
+        regular.delete()
+        self.assertFalse(occurrences.exists())
+
+    def test_rebuild(self):
+        self.create_regular()
+        extra = self.create_extra()
+        TransactionOccurrence.objects.all().delete()
+
+        call_command("rebuild_occurrences", stdout=StringIO())
+
+        self.assertEqual(
+            TransactionOccurrence.objects.filter(
+                model="extratransactionmodel", source_id=extra.id
+            ).count(),
+            1,
+        )
+        self.assertTrue(
+            TransactionOccurrence.objects.filter(
+                model="regulartransactionmodel"
+            ).exists()
+        )
+
+    def test_extended_past_horizon(self):
+        regular = self.create_regular(
+            amount=Decimal("-5"), billing_start=date(2020, 1, 1)
+        )
+        occurrences = TransactionOccurrence.objects.for_source(
+            "regulartransactionmodel", regular.id
+        )
+        horizon = occurrences.latest("date").date
+
+        TransactionOccurrence.objects.extend([self.account.id], date(2040, 1, 1))
+        self.assertEqual(occurrences.latest("date").date, date(2040, 1, 1))
+        self.assertEqual(
+            occurrences.filter(date__lte=horizon).count(),
+            len(regular.get_occurrences(date.min, horizon)),
+        )
+
+        # Nothing is missing anymore
+        self.assertEqual(
+            TransactionOccurrence.objects.extend([self.account.id], date(2040, 1, 1)),
+            {},
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OccurrenceMigrationTest(TransactionTestCase):
+    before = [("account", "0014_range_indexes")]
+
+    def migrate(self, targets) -> MigrationExecutor:
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor
+
+    def test_existing_transactions(self):
+        # Transactions existed before occurrences were stored
+        apps = self.migrate(self.before).loader.project_state(self.before).apps
+        owner = apps.get_model("auth", "User").objects.create(username="owner")
+        currency = apps.get_model("account", "CurrencyModel").objects.create(name="CZK")
+        account, savings = [
+            apps.get_model("account", "MoneyAccountModel").objects.create(
+                name=name, currency=currency, owner=owner
+            )
+            for name in ["Checking", "Savings"]
+        ]
+        regular = apps.get_model("account", "RegularTransactionModel").objects
+        regular.create(
+            name="Regular",
+            amount=Decimal("-5"),
+            period="Monthly",
+            billing_start=date(2020, 1, 1),
+            target_account=account,
+        )
+        regular.create(
+            name="Transfer",
+            amount=Decimal("-100"),
+            period="Monthly",
+            billing_start=date(2024, 1, 1),
+            billing_end=date(2024, 3, 31),
+            target_account=account,
+            counterparty_account=account,
+        )
+        apps.get_model("account", "ExtraTransactionModel").objects.create(
+            name="Extra",
+            amount=Decimal("-10"),
+            date=date(2024, 1, 15),
+            target_account=account,
+            counterparty_account=savings,
+        )
+
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+        fields = ["model", "source_id", "account_id", "date", "amount", "counterparty"]
+        migrated = sorted(TransactionOccurrence.objects.values_list(*fields))
+        call_command("rebuild_occurrences", stdout=StringIO())
+        self.assertEqual(
+            migrated, sorted(TransactionOccurrence.objects.values_list(*fields))
+        )
+        balances = BalanceCheckpoint.objects.opening_balances(
+            MoneyAccountModel.objects.order_by("name"), date(2025, 1, 1)
+        )
+        self.assertEqual(list(balances.values()), [Decimal("-310"), Decimal("10")])
+
+
+class BalanceCheckpointTest(AccountTestCase):
+    def test_opening_balance(self):
+        self.create_regular(billing_start=date(2022, 1, 31))
+        self.create_extra(date=date(2023, 6, 1), counterparty_account=self.savings)
+
+        balances = BalanceCheckpoint.objects.opening_balances(
+            [self.account, self.savings], date(2024, 3, 15)
+        )
+        # 26 monthly payments from January 2022 to February 2024
+        self.assertEqual(balances[self.account.id], Decimal("-2610"))
+        self.assertEqual(balances[self.savings.id], Decimal("10"))
+        self.assertEqual(
+            BalanceCheckpoint.objects.get(
+                account=self.account, date=date(2024, 2, 29)
+            ).balance,
+            Decimal("-2610"),
+        )
+
+    def test_change_invalidates_later_checkpoints(self):
+        regular = self.create_regular(billing_start=date(2022, 1, 1))
+        BalanceCheckpoint.objects.opening_balances([self.account], date(2024, 1, 1))
+        self.assertEqual(BalanceCheckpoint.objects.count(), 24)
+
+        extra = self.create_extra(date=date(2023, 6, 10))
+        self.assertEqual(
+            BalanceCheckpoint.objects.filter(account=self.account).latest("date").date,
+            date(2023, 5, 31),
+        )
+        balances = BalanceCheckpoint.objects.opening_balances(
+            [self.account], date(2024, 1, 1)
+        )
+        self.assertEqual(balances[self.account.id], Decimal("-2410"))
+
+        extra.delete()
+        regular.billing_start = date(2023, 1, 1)
+        regular.save()
+        balances = BalanceCheckpoint.objects.opening_balances(
+            [self.account], date(2024, 1, 1)
+        )
+        self.assertEqual(balances[self.account.id], Decimal("-1200"))
+
+    def test_opening_balance_past_horizon(self):
+        self.create_regular(amount=Decimal("-5"), billing_start=date(2020, 1, 1))
+        # Checkpoint computed before the occurrences past it were stored
+        BalanceCheckpoint.objects.create(
+            account=self.account, date=date(2030, 12, 31), balance=Decimal("-1")
+        )
+
+        short = get_ideal_account_balance(
+            [self.account], date(2031, 1, 1), date(2031, 3, 31), from_checkpoint=True
+        )
+        long = get_ideal_account_balance(
+            [self.account], date(2024, 1, 1), date(2031, 1, 1)
+        )
+        opening = BalanceCheckpoint.objects.opening_balances(
+            [self.account], date(2024, 1, 1)
+        )[self.account.id]
+        self.assertEqual(short.balance.iloc[0], -665)
+        self.assertEqual(long.balance.iloc[-1] + float(opening), -665)
+
+    def test_ideal_balance_from_checkpoint(self):
+        self.create_regular(billing_start=date(2023, 1, 1))
+        df = get_ideal_account_balance(
+            [self.account], date(2024, 1, 1), date(2024, 1, 31), from_checkpoint=True
+        )
+        self.assertEqual(df.balance.iloc[0], -1300)
+        self.assertEqual(df.balance.iloc[-1], -1300)
+
+
+class ConcurrentExtensionTest(AccountTestMixin, TransactionTestCase):
+    def test_concurrent_opening_balances(self):
+        self.create_regular(
+            period=RegularTransactionModel.Period.Daily,
+            amount=Decimal("-1"),
+            billing_start=date(2022, 1, 1),
+        )
+        # Saved while the horizon ended in 2023
+        TransactionOccurrence.objects.filter(date__gt=date(2023, 12, 31)).delete()
+
+        # Panels compute opening balances in their own threads at once
+        barrier = threading.Barrier(3)
+        balances = []
+
+        def read():
+            try:
+                barrier.wait()
+                balances.append(
+                    BalanceCheckpoint.objects.opening_balances(
+                        [self.account], date(2025, 1, 1)
+                    )[self.account.id]
+                )
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(balances, [Decimal("-1096")] * 3)
+        days = TransactionOccurrence.objects.filter(date__lte=date(2024, 12, 31))
+        self.assertEqual(days.count(), 1096)
+        self.assertEqual(
+            BalanceCheckpoint.objects.opening_balances(
+                [self.account], date(2025, 1, 1)
+            )[self.account.id],
+            Decimal("-1096"),
+        )
+
+
+class RealBalanceTest(AccountTestCase):
+    def test_manual_states(self):
+        self.create_regular(
+            period=RegularTransactionModel.Period.Daily,
+            billing_start=date(2023, 12, 1),
+            amount=Decimal("-10"),
+        )
+        ManualAccountStateModel.objects.create(
+            account=self.account, date=date(2023, 12, 29), amount=Decimal("500")
+        )
+        ManualAccountStateModel.objects.create(
+            account=self.account, date=date(2024, 1, 3), amount=Decimal("1000")
+        )
+
+        df = get_real_account_balance(
+            [self.account, self.savings], date(2024, 1, 1), date(2024, 1, 5)
+        )
+
+        self.assertEqual(len(df), 10)
+        self.assertEqual(
+            df.loc[self.account.id].real_balance.tolist(),
+            [470, 460, 1000, 990, 980],
+        )
+        self.assertEqual(df.loc[self.savings.id].real_balance.tolist(), [0] * 5)
+        self.assertEqual(
+            df.loc[self.account.id].balance_snapshot.dropna().tolist(),
+            [Decimal("1000")],
+        )
+
+
+class DownsampleBalanceTest(AccountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_regular(
+            period=RegularTransactionModel.Period.Daily,
+            billing_start=date(2024, 1, 1),
+            amount=Decimal("-10"),
+            counterparty_account=self.savings,
+        )
+        self.create_extra(date=date(2024, 7, 1), amount=Decimal("5000"))
+        self.create_extra(date=date(2024, 7, 2), amount=Decimal("-5000"))
+        self.balance = get_real_account_balance(
+            [self.account, self.savings], date(2024, 1, 1), date(2025, 12, 31)
+        )
+
+    def test_keeps_peaks_and_shared_days(self):
+        for method in ["lttb", "min_max"]:
+            df = downsample_balance(self.balance, 50, method=method)
+
+            days = df.loc[self.account.id].index
+            self.assertLessEqual(len(days), 50 + 2)
+            self.assertEqual(days.tolist(), df.loc[self.savings.id].index.tolist())
+            self.assertEqual(days[0], date(2024, 1, 1))
+            self.assertEqual(days[-1], date(2025, 12, 31))
+            self.assertIn(date(2024, 7, 1), days)
+
+    def test_single_series(self):
+        total = self.balance.groupby("date")[["real_balance"]].sum()
+        self.assertEqual(len(downsample_balance(total, 50)), 50)
+        self.assertIs(downsample_balance(total, 1000), total)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            downsample_balance(self.balance, 50, method="mean")
+
+
+class MoneyTest(AccountTestCase):
+    def test_cents_round_trip(self):
+        amounts = [Decimal("0.10"), Decimal("-1234567.89"), Decimal("0")]
+        self.assertEqual(to_cents(amounts).tolist(), [10, -123456789, 0])
+        self.assertEqual(from_cents(to_cents(amounts)).tolist(), amounts)
+
+    def test_format_currency(self):
+        currency = CurrencyModel(name="USD", prefix="$", suffix="USD")
+        amounts = [
+            Decimal("1234567.25"),
+            Decimal("-1000.04"),
+            Decimal("0.35"),
+            Decimal("-0.04"),
+            0,
+        ]
+        expected = ["$1 234 567.2 USD", "$-1 000 USD", "$0.4 USD", "$-0 USD", "$0 USD"]
+
+        self.assertEqual(currency.format_currency_many(amounts).tolist(), expected)
+        self.assertEqual(
+            currency.format_currency_many(pd.Series(amounts, dtype=object)).tolist(),
+            expected,
+        )
+        self.assertEqual([currency.format_currency(a) for a in amounts], expected)
+        self.assertEqual(self.currency.format_currency(1500.5), "1 500.5 Kč")
+        self.assertIs(currency.formatter, currency.formatter)
+
+    def test_format_single_as_many(self):
+        formatter = self.currency.formatter
+        amounts = [x / 100 for x in range(-1000, 1000)] + [12.35, -0.05, np.nan]
+        self.assertEqual(
+            [formatter(amount) for amount in amounts],
+            formatter.format_many(amounts).tolist(),
+        )
+
+    def test_balance_is_exact(self):
+        self.create_regular(
+            period=RegularTransactionModel.Period.Daily,
+            amount=Decimal("0.10"),
+        )
+        df = get_ideal_account_balance(
+            [self.account], date(2024, 1, 1), date(2024, 12, 31)
+        )
+        self.assertEqual(df.amount.sum(), Decimal("36.60"))
+        self.assertEqual(df.balance.iloc[-1], 36.6)
+
+
+@skipUnless(connection.vendor == "sqlite", "Query plans are SQLite specific")
+class ExpensesTest(AccountTestCase):
+    functions = [
+        get_expenses_per_category,
+        get_expenses_per_category_per_month,
+        get_expenses_per_tag,
+        get_expenses_per_tag_per_month,
+    ]
+
+    def test_without_transactions(self):
+        for function in self.functions:
+            df = function([self.account], date(2024, 1, 1), date(2024, 1, 31))
+            self.assertTrue(df.empty)
+            self.assertEqual(list(df.columns), ["amount"])
+
+
+class QueryPlanTest(AccountTestCase):
+    def assertUsesIndex(self, queryset: QuerySet, fields: list[str]):
+        model = queryset.model
+        names = [index.name for index in model._meta.indexes if index.fields == fields]
+        self.assertEqual(len(names), 1, f"No index on {fields} of {model}")
+
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {names[0]}", plan)
+        self.assertNotIn(f"SCAN {model._meta.db_table}", plan)
+
+    def test_extra_transactions_in_range(self):
+        queryset = ExtraTransactionModel.objects.all_for_account_in_range(
+            [self.account, self.savings], date(2024, 1, 1), date(2024, 12, 31)
+        )
+        self.assertUsesIndex(queryset, ["target_account", "date"])
+        self.assertUsesIndex(queryset, ["counterparty_account", "date"])
+
+    def test_regular_transactions_in_range(self):
+        queryset = RegularTransactionModel.objects.all_for_account_in_range(
+            [self.account, self.savings], date(2024, 1, 1), date(2024, 12, 31)
+        )
+        self.assertUsesIndex(
+            queryset, ["target_account", "billing_start", "billing_end"]
+        )
+        self.assertUsesIndex(
+            queryset, ["counterparty_account", "billing_start", "billing_end"]
+        )
+
+    def test_manual_states(self):
+        queryset = ManualAccountStateModel.objects.filter(
+            account__in=[self.account], date__lte=date(2024, 12, 31)
+        )
+        self.assertUsesIndex(queryset, ["account", "date"])
+
+    def test_history_since(self):
+        for model in [ExtraTransactionModel, RegularTransactionModel]:
+            queryset = model.history.filter(
+                history_date__gte=timezone.make_aware(datetime(2024, 1, 1))
+            )
+            self.assertUsesIndex(queryset, ["history_date", "id"])
+
+
+class ResultCacheTest(AccountTestCase):
+    def count_queries(self, account: MoneyAccountModel) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            get_ideal_account_balance([account], date(2024, 1, 1), date(2024, 1, 31))
+        return len(queries)
+
+    def test_repeated_calls_are_cached(self):
+        self.create_regular()
+        self.assertGreater(self.count_queries(self.account), 0)
+        self.assertEqual(self.count_queries(self.account), 0)
+
+    def test_changes_invalidate_affected_accounts(self):
+        regular = self.create_regular()
+        self.count_queries(self.account)
+        self.count_queries(self.savings)
+
+        # Versions are bumped once the changes are committed
+        with self.captureOnCommitCallbacks(execute=True):
+            regular.amount = Decimal("-200")
+            regular.save()
+        self.assertEqual(self.count_queries(self.savings), 0)
+        df = get_ideal_account_balance(
+            [self.account], date(2024, 1, 1), date(2024, 1, 31)
+        )
+        self.assertEqual(df.balance.iloc[-1], -200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = "Food"
+            self.tag.save()
+        self.assertGreater(self.count_queries(self.savings), 0)
+
+    def test_versions_bumped_on_commit(self):
+        versions = get_versions([self.account.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_extra()
+            # Concurrent requests would cache old data under a new version
+            self.assertEqual(get_versions([self.account.id]), versions)
+        self.assertNotEqual(
+            get_versions([self.account.id])[self.account.id],
+            versions[self.account.id],
+        )
+
+    def test_currency_changes_invalidate_all_accounts(self):
+        versions = get_versions([])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.currency.suffix = "CZK"
+            self.currency.save()
+        self.assertNotEqual(get_versions([])[GLOBAL_VERSION], versions[GLOBAL_VERSION])
+
+
+class DashboardPanelTest(AccountTestCase):
+    panels = [
+        panels.AccountsPanel,
+        panels.BalancePanel,
+        panels.CategoryExpensesPanel,
+        panels.TagExpensesPanel,
+        panels.WaterfallPanel,
+        panels.UpcomingPanel,
+    ]
+
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        self.create_regular(
+            period=RegularTransactionModel.Period.Daily,
+            billing_start=today - timedelta(days=800),
+            counterparty_account=self.savings,
+        )
+        self.create_extra(date=today + timedelta(days=2))
+
+    def count_queries(self, days: int) -> int:
+        today = date.today()
+        count = 0
+        for panel in self.panels:
+            cache.clear()
+            view = panel()
+            view.setup(RequestFactory().get("/"))
+            with CaptureQueriesContext(connection) as queries:
+                view.get_panel(today - timedelta(days=days), today + timedelta(days=30))
+            count += len(queries)
+        return count
+
+    def test_query_count_does_not_depend_on_days(self):
+        # Stored balances are computed once, no matter how many days are shown
+        BalanceCheckpoint.objects.opening_balances(
+            MoneyAccountModel.objects.all(), date.today()
+        )
+
+        self.assertEqual(self.count_queries(30), self.count_queries(730))
+
+    def test_window_from_query_string(self):
+        today = date.today()
+        full = panels.Dashboard(today - timedelta(days=700), today).balance
+        window = panels.Dashboard(today - timedelta(days=90), today).balance
+
+        # Balances are carried into the window from before its start
+        self.assertEqual(len(window), 2 * 91)
+        self.assertEqual(
+            window.real_balance.tolist(),
+            full[full.date >= today - timedelta(days=90)].real_balance.tolist(),
+        )
+
+    def get_panel(self, panel) -> dict:
+        view = panel()
+        view.setup(RequestFactory().get("/"))
+        return view.get_panel(date.today() - timedelta(days=90), date.today())
+
+    def test_panels_are_cached(self):
+        self.get_panel(panels.UpcomingPanel)
+        with CaptureQueriesContext(connection) as queries:
+            self.get_panel(panels.UpcomingPanel)
+        # Only ids of accounts to look up their data versions
+        self.assertEqual(len(queries), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_extra(name="Changed", date=date.today() + timedelta(days=3))
+        data = self.get_panel(panels.UpcomingPanel)
+        self.assertIn("Changed", [event["name"] for event in data["expenses"]])
+
+    def test_account_cards_are_cached_per_account(self):
+        self.get_panel(panels.AccountsPanel)
+        versions = get_versions([self.account.id])
+        key = make_template_fragment_key(
+            "account_card",
+            [
+                self.account.id,
+                f"{versions[GLOBAL_VERSION]}:{versions[self.account.id]}",
+                date.today(),
+            ],
+        )
+        cache.set(key, "cached card")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_extra(target_account=self.savings)
+        cards = self.get_panel(panels.AccountsPanel)["html"]["accounts"]
+        self.assertIn("cached card", cards)
+        self.assertIn("Savings", cards)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_extra()
+        cards = self.get_panel(panels.AccountsPanel)["html"]["accounts"]
+        self.assertNotIn("cached card", cards)
+
+
+# Panels are computed in worker threads, which only see committed data
+class DashboardPanelViewTest(AccountTestMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+
+        today = date.today()
+        self.create_regular(
+            period=RegularTransactionModel.Period.Daily,
+            billing_start=today - timedelta(days=800),
+            counterparty_account=self.savings,
+        )
+        self.create_extra(date=today + timedelta(days=2))
+
+    def test_summary_does_not_depend_on_window(self):
+        url = reverse("panel-accounts")
+        self.assertEqual(
+            self.client.get(url, {"start": "2020-01-01", "end": "2020-03-31"}).json(),
+            self.client.get(url).json(),
+        )
+
+    def test_invalid_window(self):
+        url = reverse("panel-balance")
+        self.assertEqual(self.client.get(url, {"start": "tomorrow"}).status_code, 400)
+        response = self.client.get(url, {"start": "2024-02-01", "end": "2024-01-01"})
+        self.assertEqual(response.status_code, 400)
+        # Dates out of the supported range or too long windows
+        for window in [
+            {"start": "0001-01-01"},
+            {"end": "9999-12-31"},
+            {"start": "1900-01-01", "end": "2099-12-31"},
+        ]:
+            self.assertEqual(self.client.get(url, window).status_code, 400)
+
+    def test_panels_are_async(self):
+        # Panels of a page are computed concurrently under ASGI
+        for panel in DashboardPanelTest.panels:
+            self.assertTrue(panel.view_is_async)
+
+    def test_home_loads_every_panel(self):
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        for name in [
+            "panel-accounts",
+            "panel-balance",
+            "panel-category-expenses",
+            "panel-tag-expenses",
+            "panel-waterfall",
+            "panel-upcoming",
+            "plotly-js",
+        ]:
+            self.assertContains(response, reverse(name))
+
+    def test_accounts_panel(self):
+        data = self.client.get(reverse("panel-accounts")).json()
+        self.assertEqual(
+            [summary["name"] for summary in data["accounts"]], ["Checking", "Savings"]
+        )
+        self.assertIn("Checking", data["html"]["accounts"])
+
+    def test_figure_panels(self):
+        for name, figures in [
+            (
+                "panel-balance",
+                {
+                    "daily_balance",
+                    "daily_balance_accounts_not_ignored",
+                    "daily_balance_accounts",
+                    "daily_model_balance_accounts",
+                },
+            ),
+            ("panel-category-expenses", {"category"}),
+            ("panel-tag-expenses", {"tags"}),
+            ("panel-waterfall", {"balance", "daily_balance_this_month"}),
+        ]:
+            data = self.client.get(reverse(name)).json()
+            self.assertEqual(data["figures"].keys(), figures)
+            for figure in data["figures"].values():
+                self.assertIn("data", figure)
+                self.assertIn("layout", figure)
+
+    def test_upcoming_panel(self):
+        data = self.client.get(reverse("panel-upcoming")).json()
+        extra = [event for event in data["expenses"] if event["name"] == "Extra"]
+        self.assertEqual([event["days"] for event in extra], [2])
+        self.assertIn("Extra", data["html"]["upcoming_expenses"])
+
+
+class CompactFigureTest(TestCase):
+    def decode(self, values: dict) -> list:
+        self.assertEqual(values["dtype"], "f8")
+        return np.frombuffer(base64.b64decode(values["bdata"]), dtype="<f8").tolist()
+
+    def test_daily_series(self):
+        days = [date(2024, 1, 1) + timedelta(days=i) for i in range(3)]
+        figure = panels.build_balance_chart(
+            pd.DataFrame({"date": days, "balance": [1.5, -2.25, 3.0]}),
+            x="date",
+            y="balance",
+        )
+
+        data = panels.compact_figure(figure)
+        trace = data["data"][0]
+        self.assertNotIn("x", trace)
+        self.assertEqual(trace["x0"], "2024-01-01T00:00:00.000")
+        self.assertEqual(trace["dx"], 24 * 60 * 60 * 1000)
+        self.assertEqual(self.decode(trace["y"]), [1.5, -2.25, 3.0])
+        self.assertEqual(data["layout"]["xaxis"]["type"], "date")
+
+    def test_uneven_and_category_series(self):
+        figure = panels.build_category_chart(
+            pd.DataFrame(
+                {"category": ["Food", "Rent"], "amount": [Decimal("-1.10"), -5]}
+            ),
+            x="category",
+            y="amount",
+        )
+        figure.add_scatter(x=[1, 2, 4], y=[0, 0, 0])
+
+        data = panels.compact_figure(figure)
+        self.assertEqual(list(data["data"][0]["x"]), ["Food", "Rent"])
+        self.assertEqual(self.decode(data["data"][0]["y"]), [-1.1, -5.0])
+        self.assertEqual(self.decode(data["data"][1]["x"]), [1.0, 2.0, 4.0])
+        self.assertNotIn("type", data["layout"].get("xaxis", {}))
+
+
+class LedgerExportTest(AccountTestCase):
+    def export(self, *args) -> str:
+        output = StringIO()
+        call_command(
+            "ledger_export",
+            "--start-date=2024-01-01",
+            "--end-date=2024-12-31",
+            *args,
+            stdout=output,
+        )
+        return output.getvalue()
+
+    def test_entries_ordered_by_date(self):
+        self.create_extra(name="Late", date=date(2024, 3, 1))
+        self.create_extra(name="Same day", date=date(2024, 1, 15))
+        self.create_regular(name="Rent", billing_start=date(2024, 1, 15))
+        ManualAccountStateModel.objects.create(
+            account=self.account, date=date(2024, 1, 15), amount=Decimal("500")
+        )
+
+        entries = self.export().split("\n\n\n")
+        self.assertEqual(entries[-1], "")
+        headings = [entry.splitlines()[0] for entry in entries[:-1]]
+        self.assertEqual(len(headings), 15)
+        self.assertEqual(headings, sorted(headings, key=lambda h: h[:10]))
+        # Entries of the same day keep the order of their sources
+        self.assertIn("Manual adjustment", headings[0])
+        self.assertIn('"Rent"', headings[1])
+        self.assertIn('"Same day"', headings[2])
+        self.assertIn('"Late"', headings[4])
+
+    def test_queries_do_not_grow(self):
+        self.create_regular()
+        for day in range(1, 11):
+            self.create_extra(date=date(2024, 2, day)).tag.add(self.tag)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.export()
+        count = len(queries)
+
+        for day in range(11, 21):
+            self.create_extra(date=date(2024, 2, day)).tag.add(self.tag)
+        self.create_regular(category=self.category)
+
+        with self.assertNumQueries(count):
+            self.export()
+
+    def test_window(self):
+        self.create_extra(date=date(2024, 3, 31))
+        # Schedules started before the window are expanded within it
+        self.create_regular(
+            period=RegularTransactionModel.Period.Weekly,
+            billing_start=date(2023, 2, 2),
+        )
+
+        output = StringIO()
+        call_command(
+            "ledger_export",
+            "--start-date=2024-02-01",
+            "--end-date=2024-03-31",
+            stdout=output,
+        )
+        days = [entry.split()[0] for entry in output.getvalue().split("\n\n\n")[:-1]]
+        self.assertEqual(days[0], "2024-02-01")
+        self.assertEqual(days[-1], "2024-03-31")
+        self.assertTrue(all("2024-02-01" <= day <= "2024-03-31" for day in days))
+
+    def test_invalid_arguments(self):
+        for args in [
+            ["--start-date=2024-13-01"],
+            ["--end-date=31.12.2024"],
+            ["--output=/tmp"],
+            ["--jobs=2"],
+            ["--force"],
+            ["--split-by=month", "--output=/tmp", "--jobs=0"],
+        ]:
+            with self.assertRaises(CommandError):
+                self.export(*args)
+
+    def test_split_by_month(self):
+        self.create_regular(counterparty_account=self.savings)
+        self.create_extra(date=date(2024, 3, 2))
+        expected = self.export()
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.export("--split-by=month", f"--output={directory}")
+
+            with open(os.path.join(directory, "main.journal")) as main:
+                files = [line.split()[1] for line in main]
+            self.assertEqual(files, [f"2024-{m:02}.journal" for m in range(1, 13)])
+
+            journals = []
+            for name in files:
+                with open(os.path.join(directory, name)) as journal:
+                    journals.append(journal.read())
+
+        self.assertEqual("".join(journals), expected)
+        self.assertEqual(journals[2].count("\n\n\n"), 2)
+
+    def test_split_by_account(self):
+        self.create_regular(counterparty_account=self.savings)
+        self.create_extra(target_account=self.savings)
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.export("--split-by=account", f"--output={directory}")
+
+            with open(
+                os.path.join(directory, f"{self.savings.id}-savings.journal")
+            ) as journal:
+                self.assertEqual(journal.read().count("\n\n\n"), 1)
+
+    def test_incremental_split(self):
+        self.create_regular(billing_start=date(2024, 6, 1))
+        extra = self.create_extra(date=date(2024, 3, 2))
+
+        with tempfile.TemporaryDirectory() as directory:
+            args = ["--split-by=month", f"--output={directory}"]
+            self.assertIn("Exported 12 of 12 partitions", self.export(*args))
+            self.assertIn("Exported 0 of 12 partitions", self.export(*args))
+
+            extra.name = "Renamed"
+            extra.save()
+            self.assertIn("Exported 1 of 12 partitions", self.export(*args))
+            with open(os.path.join(directory, "2024-03.journal")) as journal:
+                self.assertIn('"Renamed"', journal.read())
+
+            # Moved entries change both partitions
+            extra.date = date(2024, 5, 2)
+            extra.save()
+            self.assertIn("Exported 2 of 12 partitions", self.export(*args))
+
+            # Schedules change every partition they span
+            RegularTransactionModel.objects.get().tag.add(self.tag)
+            self.assertIn("Exported 7 of 12 partitions", self.export(*args))
+
+            self.assertIn("Exported 12 of 12 partitions", self.export(*args, "--force"))
+
+    def test_occurrences_share_schedule(self):
+        schedule = RegularTransactionLedger(
+            id="1",
+            name="Lunch",
+            description="",
+            tags=("Food",),
+            postings=(
+                Posting(
+                    account="Expenses:Food",
+                    amount=AmountTransfer(amount=Decimal("10"), currency="CZK"),
+                    tags=(),
+                ),
+                Posting(account="Assets:Checking", amount=None, tags=()),
+            ),
+            date=date(2024, 1, 1),
+            period="daily",
+            billing_end=None,
+            recurrence=Recurrence("Daily", date(2024, 1, 1)),
+        )
+
+        occurrences = list(
+            schedule.generate_transactions(date(2024, 2, 1), date(2024, 2, 29))
+        )
+        self.assertEqual(len(occurrences), 29)
+        self.assertEqual(occurrences[1].date, date(2024, 2, 2))
+        for occurrence in occurrences:
+            self.assertIs(type(occurrence), TransactionLedger)
+            self.assertIs(occurrence.postings, schedule.postings)
+            self.assertIs(occurrence.tags, schedule.tags)
+        self.assertEqual(
+            str(occurrences[0]),
+            '2024-02-01 * (1) "Lunch"\n'
+            "  ; :Food:\n"
+            "  Expenses:Food   10 CZK\n"
+            "  Assets:Checking",
+        )
+
+    def test_entries_are_immutable(self):
+        regular = self.create_regular(category=self.category)
+        regular.tag.add(self.tag)
+        ManualAccountStateModel.objects.create(
+            account=self.account, date=date(2024, 1, 15), amount=Decimal("500")
+        )
+
+        for entry in [
+            *ledger.regular_transaction_ledger(regular),
+            *ledger.extra_transaction_ledger(self.create_extra()),
+            *ledger.manual_account_state_ledger(ManualAccountStateModel.objects.get()),
+        ]:
+            self.assertIsInstance(entry.tags, tuple)
+            self.assertIsInstance(entry.postings, tuple)
+            for posting in entry.postings:
+                self.assertIsInstance(posting.tags, tuple)
+
+    def test_occurrences_match_dashboard(self):
+        for period, billing_start in [
+            ("Daily", date(2023, 12, 30)),
+            ("Weekly", date(2020, 3, 5)),
+            ("Monthly", date(2023, 1, 31)),
+            ("Quarterly", date(2023, 11, 30)),
+            ("Half-Yearly", date(2024, 3, 15)),
+            ("Yearly", date(2019, 2, 28)),
+            ("Work-Day", date(2024, 6, 1)),
+        ]:
+            self.create_regular(name=period, period=period, billing_start=billing_start)
+        self.create_regular(name="Ended", billing_end=date(2023, 12, 31))
+
+        days = {}
+        for entry in self.export().split("\n\n\n")[:-1]:
+            heading = entry.splitlines()[0]
+            days.setdefault(heading.split('"')[1], []).append(
+                date.fromisoformat(heading[:10])
+            )
+
+        for regular in RegularTransactionModel.objects.exclude(name="Ended"):
+            self.assertEqual(
+                days[regular.name],
+                list(
+                    regular.get_occurrences(date(2024, 1, 1), date(2024, 12, 31)).date
+                ),
+            )
+        self.assertEqual(len(days["Daily"]), 366)
+        self.assertNotIn("Ended", days)
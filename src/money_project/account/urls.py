@@ -1,7 +1,22 @@
 from django.urls import path
 
-from .views import home
+from .views import home, panels
 
 urlpatterns = [
     path("", home.HomeView.as_view(), name="home"),
+    path("plotly.min.js", home.plotly_js, name="plotly-js"),
+    path("panels/accounts/", panels.AccountsPanel.as_view(), name="panel-accounts"),
+    path("panels/balance/", panels.BalancePanel.as_view(), name="panel-balance"),
+    path(
+        "panels/expenses/category/",
+        panels.CategoryExpensesPanel.as_view(),
+        name="panel-category-expenses",
+    ),
+    path(
+        "panels/expenses/tag/",
+        panels.TagExpensesPanel.as_view(),
+        name="panel-tag-expenses",
+    ),
+    path("panels/waterfall/", panels.WaterfallPanel.as_view(), name="panel-waterfall"),
+    path("panels/upcoming/", panels.UpcomingPanel.as_view(), name="panel-upcoming"),
 ]
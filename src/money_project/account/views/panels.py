@@ -0,0 +1,688 @@
+import base64
+import calendar
+import functools
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.views import View
+from django.views.decorators.gzip import gzip_page
+from pandas.tseries.offsets import DateOffset
+from plotly.graph_objects import Figure
+from plotly.utils import PlotlyJSONEncoder
+
+from ..accounting.balance import downsample_balance, get_real_account_balance
+from ..accounting.cache import GLOBAL_VERSION, get_versions, versioned_key
+from ..accounting.context import AccountingContext
+from ..accounting.expence import get_expenses_per_category, get_expenses_per_tag
+from ..forms import DashboardWindowForm
+from ..models import MoneyAccountModel
+
+
+def default_figure_layout(figure: Figure):
+    figure.update_layout(
+        {
+            "plot_bgcolor": "rgba(0, 0, 0, 0)",
+            "paper_bgcolor": "rgba(0, 0, 0, 0)",
+            "margin": dict(l=20, r=20, t=20, b=20),
+            "xaxis_title": None,
+            "yaxis_title": None,
+        }
+    )
+    figure.update_yaxes(automargin=True)
+
+
+def _typed_array(values: np.ndarray) -> dict:
+    # Typed array spec of plotly.js, decoded natively in the browser
+    data = np.ascontiguousarray(values, dtype="<f8")
+    return {"dtype": "f8", "bdata": base64.b64encode(data).decode("ascii")}
+
+
+def _series_values(values) -> tuple[Optional[np.ndarray], bool]:
+    """
+    Values of a trace series as ``float64``, dates as milliseconds since epoch.
+
+    Returns ``None`` for series which can't be encoded, e.g. category names,
+    and whether the series contains dates.
+    """
+    values = np.asarray(values)
+    if values.ndim != 1 or len(values) == 0:
+        return None, False
+
+    if values.dtype.kind == "O":
+        if isinstance(values[0], date):
+            values = values.astype("datetime64[ms]")
+        elif isinstance(values[0], (Decimal, int, float)):
+            values = values.astype(np.float64)
+        else:
+            return None, False
+
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ms]").astype(np.int64).astype(np.float64), True
+    if values.dtype.kind in "iuf":
+        return values.astype(np.float64), False
+    return None, False
+
+
+def compact_figure(figure: Figure) -> dict:
+    """
+    Plotly JSON of a figure with ``x`` and ``y`` series as base64 typed arrays.
+
+    Dates are sent as milliseconds on a date axis instead of one string per
+    point, evenly spaced ``x``, e.g. daily balances, only as ``x0`` and ``dx``.
+    """
+    data = figure.to_plotly_json()
+    has_dates = False
+    for trace in data["data"]:
+        for name in ["x", "y"]:
+            if name not in trace:
+                continue
+            values, dates = _series_values(trace[name])
+            if values is None:
+                continue
+
+            steps = np.diff(values)
+            if name == "x" and len(steps) > 1 and (steps == steps[0]).all():
+                del trace["x"]
+                trace["x0"] = (
+                    str(np.datetime64(int(values[0]), "ms")) if dates else values[0]
+                )
+                trace["dx"] = steps[0]
+            else:
+                trace[name] = _typed_array(values)
+            has_dates |= dates and name == "x"
+
+    if has_dates:
+        data["layout"].setdefault("xaxis", {})["type"] = "date"
+    return data
+
+
+def build_category_chart(df: pd.DataFrame, x: str, y: str) -> Figure:
+    figure = px.bar(df, x=x, y=y, template="none")
+    default_figure_layout(figure)
+    return figure
+
+
+def build_balance_chart(df: pd.DataFrame, x: str, y: str, **kwargs) -> Figure:
+    figure = px.area(df, x=x, y=y, template="none", **kwargs)
+    default_figure_layout(figure)
+    figure.update_layout({"width": 1000})
+    return figure
+
+
+def build_balance_waterfall_chart(
+    df: pd.DataFrame, x: str, y: str, base: float
+) -> Figure:
+    x_data = df[x].values
+    y_data = df[y].values
+
+    figure = go.Figure(
+        go.Waterfall(
+            x=x_data,
+            y=y_data,
+            base=base,
+            # measure=["relative" for _ in range(len(x_data))],
+        )
+    )
+
+    default_figure_layout(figure)
+    figure.update_layout({"width": 1000})
+    return figure
+
+
+def build_balance_waterfall_chart_diff(
+    df: pd.DataFrame, x: str, y: str, base: float
+) -> Figure:
+    x_data = df[x].values
+    y_data = (df[y].shift(-1) - df[y]).values
+
+    figure = go.Figure(
+        go.Waterfall(
+            x=x_data,
+            y=y_data,
+            base=base,
+            # measure=["relative" for _ in range(len(x_data))],
+        )
+    )
+
+    default_figure_layout(figure)
+    figure.update_layout({"width": 1000})
+    return figure
+
+
+def format_amounts(
+    amounts: pd.DataFrame, accounts: dict[int, MoneyAccountModel]
+) -> pd.DataFrame:
+    """
+    Format amounts of accounts in rows with currency of each account.
+    """
+    result = pd.DataFrame(index=amounts.index, columns=amounts.columns, dtype=object)
+    currencies = [accounts[account_id].currency_id for account_id in amounts.index]
+    for _, rows in amounts.groupby(currencies):
+        formatter = accounts[rows.index[0]].currency.formatter
+        result.loc[rows.index] = formatter.format_many(
+            rows.to_numpy(dtype="float64").ravel()
+        ).reshape(rows.shape)
+    return result
+
+
+class Dashboard:
+    """
+    Data of dashboard panels for one request.
+
+    Charts show the ``start_date`` - ``end_date`` window, balances of the
+    window start at balances carried from the stored checkpoints. Summaries
+    of the current month and year don't depend on the window.
+
+    Everything is computed lazily, a panel only pays for the data it shows.
+    """
+
+    def __init__(self, start_date: date, end_date: date):
+        self.start_date = start_date
+        self.end_date = end_date
+
+        self.today = date.today()
+        self.start_of_month = self.today.replace(day=1)
+        self.end_of_month = self.today.replace(
+            day=calendar.monthrange(self.today.year, self.today.month)[1]
+        )
+        self.previous_month_today = (self.start_of_month - DateOffset(months=1)).date()
+        self.end_of_year = self.today.replace(
+            day=calendar.monthrange(self.today.year, 12)[1], month=12
+        )
+
+        self.next_month_start = (self.start_of_month + DateOffset(months=1)).date()
+        self.next_month_end = (self.end_of_month + DateOffset(months=1)).date()
+
+        # Range of the summaries, from the previous month to the end of year
+        self.current_start = self.previous_month_today
+        self.current_end = max(self.end_of_year, self.next_month_end)
+
+    @functools.cached_property
+    def accounts(self) -> list[MoneyAccountModel]:
+        return list(MoneyAccountModel.objects.select_related("currency").all())
+
+    @functools.cached_property
+    def accounts_by_id(self) -> dict[int, MoneyAccountModel]:
+        return {account.id: account for account in self.accounts}
+
+    @functools.cached_property
+    def account_names(self) -> dict[int, str]:
+        return {account.id: account.name for account in self.accounts}
+
+    @functools.cached_property
+    def statistics_accounts(self) -> list[MoneyAccountModel]:
+        return [account for account in self.accounts if account.include_in_statistics]
+
+    @functools.cached_property
+    def accounting(self) -> AccountingContext:
+        # Expand transactions of the window only once for the whole panel
+        return AccountingContext(self.accounts, self.start_date, self.end_date)
+
+    @functools.cached_property
+    def current_accounting(self) -> AccountingContext:
+        if self.start_date <= self.current_start and self.current_end <= self.end_date:
+            return self.accounting
+        return AccountingContext(self.accounts, self.current_start, self.current_end)
+
+    def _balance(
+        self,
+        accounts: list[MoneyAccountModel],
+        start_date: date,
+        end_date: date,
+        accounting: AccountingContext,
+    ) -> pd.DataFrame:
+        # FIXME when this won't return any account it will crash the view
+        balance = get_real_account_balance(
+            accounts, start_date, end_date, accounting, from_checkpoint=True
+        ).reset_index()
+        balance["account"] = balance.account_id.map(self.account_names)
+        return balance
+
+    @functools.cached_property
+    def balance_with_ignored(self) -> pd.DataFrame:
+        return self._balance(
+            self.accounts, self.start_date, self.end_date, self.accounting
+        )
+
+    @functools.cached_property
+    def balance(self) -> pd.DataFrame:
+        return self._balance(
+            self.statistics_accounts, self.start_date, self.end_date, self.accounting
+        )
+
+    @functools.cached_property
+    def current_balance(self) -> pd.DataFrame:
+        return self._balance(
+            self.statistics_accounts,
+            self.current_start,
+            self.current_end,
+            self.current_accounting,
+        )
+
+    @functools.cached_property
+    def transactions_this_month(self) -> pd.DataFrame:
+        return self.current_accounting.get_transactions(
+            self.accounts, self.start_of_month, self.end_of_month
+        )
+
+    @functools.cached_property
+    def transactions_next_month(self) -> pd.DataFrame:
+        return self.current_accounting.get_transactions(
+            self.accounts, self.next_month_start, self.next_month_end
+        )
+
+    def balance_on(self, day: date) -> dict:
+        balance = self.current_balance
+        return balance[balance.date == day].set_index("account_id").to_dict()
+
+
+class PanelView(View):
+    """
+    JSON data of one dashboard panel.
+
+    Responses contain rendered ``html`` and Plotly ``figures`` for slots of
+    the dashboard page, next to the plain data of the panel. Figures are
+    sent compacted, see ``compact_figure``.
+
+    The chart window is given by ``start`` and ``end`` of the query string.
+
+    Panels of a page are requested at once, the view is asynchronous so they
+    are computed concurrently under ASGI instead of one by one in the single
+    thread Django runs synchronous views in.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Series compress well and panels contain no secrets
+        return gzip_page(super().as_view(**initkwargs))
+
+    def get_data(self, dashboard: Dashboard) -> dict:
+        raise NotImplementedError
+
+    def get_panel(self, start_date: date, end_date: date) -> dict:
+        """
+        Data of the panel, cached until data of any account changes or the
+        day ends.
+        """
+        key = versioned_key(
+            f"panel:{type(self).__qualname__}",
+            MoneyAccountModel.objects.values_list("id", flat=True),
+            start_date,
+            end_date,
+            date.today(),
+        )
+        data = cache.get(key)
+        if data is None:
+            data = self.get_data(Dashboard(start_date, end_date))
+            if "figures" in data:
+                data["figures"] = {
+                    name: compact_figure(figure)
+                    for name, figure in data["figures"].items()
+                }
+            cache.set(key, data, timeout=settings.ACCOUNT_CACHE_TIMEOUT)
+        return data
+
+    def get_panel_in_worker(self, start_date: date, end_date: date) -> dict:
+        try:
+            return self.get_panel(start_date, end_date)
+        finally:
+            # Worker threads are not part of the request cycle, which closes
+            # connections of the request thread only
+            close_old_connections()
+
+    async def get(self, request, *args, **kwargs):
+        form = DashboardWindowForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+
+        data = await sync_to_async(self.get_panel_in_worker, thread_sensitive=False)(
+            form.cleaned_data["start"], form.cleaned_data["end"]
+        )
+        return JsonResponse(data, encoder=PlotlyJSONEncoder)
+
+
+class AccountsPanel(PanelView):
+    def get_data(self, dashboard: Dashboard) -> dict:
+        accounts = dashboard.accounts
+        today = dashboard.today
+
+        # Expanses
+        this_month = dashboard.transactions_this_month
+        next_month = dashboard.transactions_next_month
+        per_account_next_month_expenses = (
+            next_month[next_month.amount < 0]
+            .reset_index()
+            .groupby("account_id")[["amount"]]
+            .sum()
+            .to_dict()["amount"]
+        )
+        per_account_this_month_expenses = (
+            this_month[this_month.amount < 0]
+            .reset_index()
+            .groupby("account_id")[["amount"]]
+            .sum()
+            .to_dict()["amount"]
+        )
+        per_account_this_month_remaining_expenses = (
+            this_month[(this_month.amount < 0) & (this_month.date > today)]
+            .reset_index()
+            .groupby("account_id")[["amount"]]
+            .sum()
+            .to_dict()["amount"]
+        )
+
+        # Balances
+        balance = dashboard.current_balance
+        today_balance_df = balance[balance.date == today].set_index("account_id")
+        today_balance = today_balance_df.to_dict()
+
+        today_previous_month_balance_df = balance[
+            balance.date == dashboard.previous_month_today
+        ].set_index("account_id")
+        a = today_previous_month_balance_df[["balance", "real_balance"]]
+        b = today_balance_df[["balance", "real_balance"]]
+        today_previous_month_balance_df = pd.concat(
+            [
+                today_previous_month_balance_df,
+                (((a - b) / a) * 100)
+                .replace([np.inf, -np.inf, np.nan], 0)
+                .map(int)
+                .add_suffix("_change"),
+            ],
+            axis=1,
+        )
+        today_previous_month_balance = today_previous_month_balance_df.to_dict()
+
+        # Balances in time
+        start_of_month_balance = dashboard.balance_on(dashboard.start_of_month)
+        end_of_month_balance = dashboard.balance_on(dashboard.end_of_month)
+        end_of_year_balance = dashboard.balance_on(dashboard.end_of_year)
+
+        # Format amounts of all accounts at once, one call per currency
+        formatted = format_amounts(
+            pd.DataFrame(
+                {
+                    "next_month_expenses": per_account_next_month_expenses,
+                    "this_month_expenses": per_account_this_month_expenses,
+                    "this_month_remaining_expenses": (
+                        per_account_this_month_remaining_expenses
+                    ),
+                    "balance": today_balance["balance"],
+                    "real_balance": today_balance["real_balance"],
+                    "real_balance_start_of_month": start_of_month_balance[
+                        "real_balance"
+                    ],
+                    "real_balance_end_of_month": end_of_month_balance["real_balance"],
+                    "real_balance_end_of_year": end_of_year_balance["real_balance"],
+                    "balance_today_last_month": today_previous_month_balance["balance"],
+                    "real_balance_today_last_month": today_previous_month_balance[
+                        "real_balance"
+                    ],
+                },
+                index=list(dashboard.accounts_by_id),
+            ).fillna(0),
+            dashboard.accounts_by_id,
+        )
+
+        summaries = [
+            {
+                "id": account.id,
+                "name": account.name,
+                #
+                # Expanses
+                "next_month_expenses": formatted.at[account.id, "next_month_expenses"],
+                "this_month_expenses": formatted.at[account.id, "this_month_expenses"],
+                "this_month_remaining_expenses": formatted.at[
+                    account.id, "this_month_remaining_expenses"
+                ],
+                #
+                # Balances
+                "balance_raw": today_balance["balance"].get(account.id, 0),
+                "balance": formatted.at[account.id, "balance"],
+                "real_balance_raw": today_balance["real_balance"].get(account.id, 0),
+                "real_balance": formatted.at[account.id, "real_balance"],
+                #
+                # Balances in time
+                "real_balance_start_of_month": formatted.at[
+                    account.id, "real_balance_start_of_month"
+                ],
+                "real_balance_end_of_month": formatted.at[
+                    account.id, "real_balance_end_of_month"
+                ],
+                "real_balance_end_of_year": formatted.at[
+                    account.id, "real_balance_end_of_year"
+                ],
+                #
+                # Last month today balances
+                "balance_today_last_month_raw": today_previous_month_balance[
+                    "balance"
+                ].get(account.id, 0),
+                "balance_today_last_month": formatted.at[
+                    account.id, "balance_today_last_month"
+                ],
+                "real_balance_today_last_month_raw": today_previous_month_balance[
+                    "real_balance"
+                ].get(account.id, 0),
+                "real_balance_today_last_month": formatted.at[
+                    account.id, "real_balance_today_last_month"
+                ],
+                # Last month today balance change
+                "balance_today_last_month_change": today_previous_month_balance[
+                    "balance_change"
+                ].get(account.id, 0),
+                "real_balance_today_last_month_change": today_previous_month_balance[
+                    "real_balance_change"
+                ].get(account.id, 0),
+            }
+            for account in accounts
+        ]
+
+        # Cards are cached by data version of their own account, only cards
+        # of changed accounts are rendered again
+        versions = get_versions(dashboard.accounts_by_id)
+        prefetch_related_objects(accounts, "tags")
+        cards = "".join(
+            render_to_string(
+                "components/account.html",
+                {
+                    "account": {"model": account, **summary},
+                    "version": f"{versions[GLOBAL_VERSION]}:{versions[account.id]}",
+                    "today": today,
+                    "cache_timeout": settings.ACCOUNT_CACHE_TIMEOUT,
+                },
+                self.request,
+            )
+            for account, summary in zip(accounts, summaries)
+            if account.show_in_overview
+        )
+
+        return {"accounts": summaries, "html": {"accounts": cards}}
+
+
+class BalancePanel(PanelView):
+    def downsample(self, balance: pd.DataFrame, column: str) -> pd.DataFrame:
+        index = [name for name in ["account_id", "date"] if name in balance]
+        return downsample_balance(
+            balance.set_index(index), settings.ACCOUNT_CHART_POINTS, column
+        ).reset_index()
+
+    def get_data(self, dashboard: Dashboard) -> dict:
+        balance = dashboard.balance
+        balance_with_ignored = dashboard.balance_with_ignored
+
+        return {
+            "figures": {
+                "daily_balance": build_balance_chart(
+                    self.downsample(
+                        balance.groupby("date")[["real_balance"]].sum().reset_index(),
+                        "real_balance",
+                    ),
+                    x="date",
+                    y="real_balance",
+                ),
+                "daily_balance_accounts_not_ignored": build_balance_chart(
+                    self.downsample(balance, "real_balance"),
+                    x="date",
+                    y="real_balance",
+                    color="account",
+                ),
+                "daily_balance_accounts": build_balance_chart(
+                    self.downsample(balance_with_ignored, "real_balance"),
+                    x="date",
+                    y="real_balance",
+                    color="account",
+                ),
+                "daily_model_balance_accounts": build_balance_chart(
+                    self.downsample(balance_with_ignored, "balance"),
+                    x="date",
+                    y="balance",
+                    color="account",
+                ),
+            }
+        }
+
+
+class CategoryExpensesPanel(PanelView):
+    def get_data(self, dashboard: Dashboard) -> dict:
+        expenses = (
+            get_expenses_per_category(
+                dashboard.accounts,
+                dashboard.start_date,
+                dashboard.end_date,
+                dashboard.accounting,
+            )
+            .reset_index()
+            .groupby("category", observed=True)[["amount"]]
+            .sum()
+            .reset_index()
+            .sort_values(by="amount")
+        )
+        return {
+            "expenses": expenses.to_dict(orient="records"),
+            "figures": {
+                "category": build_category_chart(expenses, x="category", y="amount")
+            },
+        }
+
+
+class TagExpensesPanel(PanelView):
+    def get_data(self, dashboard: Dashboard) -> dict:
+        expenses = (
+            get_expenses_per_tag(
+                dashboard.accounts,
+                dashboard.start_date,
+                dashboard.end_date,
+                dashboard.accounting,
+            )
+            .reset_index()
+            .groupby("tags")[["amount"]]
+            .sum()
+            .reset_index()
+            .sort_values(by="amount")
+        )
+        return {
+            "expenses": expenses.to_dict(orient="records"),
+            "figures": {"tags": build_category_chart(expenses, x="tags", y="amount")},
+        }
+
+
+class WaterfallPanel(PanelView):
+    def get_data(self, dashboard: Dashboard) -> dict:
+        balance = dashboard.balance
+
+        waterfall_balance = balance.copy()
+        waterfall_balance.date = balance.date.apply(pd.Timestamp)
+        waterfall_balance = (
+            waterfall_balance.groupby("date")[["real_balance"]]
+            .sum()
+            .groupby(pd.Grouper(freq="ME"))
+            .agg(first=("real_balance", "first"), last=("real_balance", "last"))
+            .reset_index()
+        )
+        waterfall_balance["diff"] = (
+            waterfall_balance["last"] - waterfall_balance["last"].shift(1)
+        ).fillna(waterfall_balance["last"].iloc[0] - waterfall_balance["first"].iloc[0])
+
+        current_balance = dashboard.current_balance
+        daily_balance_this_month = current_balance[
+            (current_balance.date >= dashboard.start_of_month)
+            & (current_balance.date <= dashboard.end_of_month)
+        ].copy()
+        daily_balance_this_month.date = daily_balance_this_month.date.apply(
+            pd.Timestamp
+        )
+        start_of_month_balance = dashboard.balance_on(dashboard.start_of_month)
+
+        return {
+            "figures": {
+                "balance": build_balance_waterfall_chart(
+                    waterfall_balance,
+                    "date",
+                    "diff",
+                    # FIXME when moving from previous year
+                    base=balance.groupby("date").real_balance.sum().iloc[0],
+                ),
+                "daily_balance_this_month": build_balance_waterfall_chart_diff(
+                    daily_balance_this_month.groupby("date")[["real_balance"]]
+                    .sum()
+                    .reset_index(),
+                    "date",
+                    "real_balance",
+                    # FIXME this return balance in first day of month we should return last day of month
+                    base=sum(start_of_month_balance["real_balance"].values()),
+                ),
+            }
+        }
+
+
+class UpcomingPanel(PanelView):
+    def get_data(self, dashboard: Dashboard) -> dict:
+        today = dashboard.today
+
+        upcoming_events = pd.concat(
+            [
+                dashboard.transactions_this_month.set_index(["account_id", "date"]),
+                dashboard.transactions_next_month.set_index(["account_id", "date"]),
+            ]
+        ).reset_index()
+        upcoming_events = upcoming_events[
+            (upcoming_events.date > today)
+            & (upcoming_events.date <= (today + timedelta(days=10)))
+        ]
+        upcoming_events["days"] = upcoming_events.date.apply(lambda v: (v - today).days)
+        upcoming_events["formatted_amount"] = upcoming_events.groupby(
+            "account_id"
+        ).amount.transform(
+            lambda amounts: dashboard.accounts_by_id[
+                amounts.name
+            ].currency.formatter.format_many(amounts)
+        )
+        # Categorical columns use NaN for missing values, templates expect None
+        upcoming_events = upcoming_events.astype(object).replace({np.nan: None})
+
+        expenses = upcoming_events[upcoming_events.amount < 0].to_dict(orient="records")
+        incomes = upcoming_events[upcoming_events.amount >= 0].to_dict(orient="records")
+        return {
+            "expenses": expenses,
+            "incomes": incomes,
+            "html": {
+                "upcoming_expenses": render_to_string(
+                    "components/upcoming.html", {"events": expenses}, self.request
+                ),
+                "upcoming_incomes": render_to_string(
+                    "components/upcoming.html", {"events": incomes}, self.request
+                ),
+            },
+        }
@@ -90,6 +90,27 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "TEST": {
+            # Dashboard panels query the database from worker threads, which
+            # can close their connections only to a file based database
+            "NAME": BASE_DIR / "test_db.sqlite3",
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# Data versions of accounts and cached results must be shared by all server
+# workers and management commands, the default cache lives in one process only
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache",
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+        },
     }
 }
 
@@ -138,3 +159,25 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Accounting
+
+# How many days ahead are occurrences of regular transactions without
+# a billing end materialized in the TransactionOccurrence table, reads past
+# the horizon extend them on demand
+ACCOUNT_OCCURRENCE_HORIZON_DAYS = 3 * 365
+
+# How long are results of accounting functions cached, they are invalidated
+# by a data version of accounts anyway
+ACCOUNT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Longest date window of the dashboard, every day of it is computed
+ACCOUNT_WINDOW_MAX_DAYS = 20 * 366
+
+# Daily balance charts longer than this many days are downsampled to about
+# this many days, roughly one point per pixel of the chart
+ACCOUNT_CHART_POINTS = 1000
+
+# Index history tables on (history_date, id) for "changed since" lookups
+SIMPLE_HISTORY_DATE_INDEX = "Composite"